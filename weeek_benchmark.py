@@ -0,0 +1,334 @@
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+os.environ.setdefault("WEEEK_API_RATE_LIMIT", "100000")
+os.environ.setdefault("GOOGLE_SHEETS_WRITE_QUOTA_PER_MINUTE", "100000")
+
+import gspread
+
+import weeek_report_generator as report
+
+BENCHMARK_TOKEN: str = "benchmark-token"
+BENCHMARK_SHEET_ID: str = "benchmark-sheet"
+WORKLOAD_COMMENTS: tuple[str, ...] = ("", "", "Исправление ошибок", "Код-ревью", "Созвон с заказчиком", "Доработка")
+
+logger = logging.getLogger("weeek_benchmark")
+
+def generate_synthetic_workspace(
+    task_count: int,
+    board_count: int,
+    member_count: int,
+    workloads_per_task: int,
+    columns_per_board: int = 5,
+    seed: int = 42,
+    reference_date: date | None = None
+) -> dict:
+    rnd = random.Random(seed)
+    reference_date = reference_date or date.today()
+    members = [{"id": f"member-{num}", "firstName": f"Сотрудник {num}"} for num in range(member_count)]
+    board_columns = {
+        board_id: [{"id": board_id * 100 + num, "name": f"Колонка {num}"} for num in range(columns_per_board)]
+        for board_id in range(1, board_count + 1)
+    }
+    tasks = []
+    for task_id in range(1, task_count + 1):
+        board_id = rnd.randint(1, board_count)
+        workloads = [
+            {
+                "date": (reference_date - timedelta(days=rnd.randint(0, 90))).isoformat(),
+                "duration": rnd.randint(15, 480),
+                "comment": rnd.choice(WORKLOAD_COMMENTS),
+            }
+            for _ in range(rnd.randint(0, 2 * workloads_per_task))
+        ]
+        updated_at = reference_date - timedelta(days=rnd.randint(0, 30))
+        tasks.append({
+            "id": task_id,
+            "title": f"Задача {task_id}",
+            "description": "Описание " * rnd.randint(0, 20),
+            "priority": rnd.choice([0, 1, 2, 3, None]),
+            "userId": rnd.choice(members)["id"] if members else None,
+            "boardId": board_id,
+            "boardColumnId": rnd.choice(board_columns[board_id])["id"],
+            "createdAt": f"{(updated_at - timedelta(days=rnd.randint(0, 60))).isoformat()}T09:00:00Z",
+            "updatedAt": f"{updated_at.isoformat()}T18:00:00Z",
+            "isCompleted": rnd.random() < 0.3,
+            "duration": rnd.choice([None, 30, 60, 120, 480]),
+            "workloads": workloads,
+        })
+    return {"members": members, "board_columns": board_columns, "tasks": tasks}
+
+class FakeWeeekServer:
+    def __init__(self, workspace: dict, page_size: int = 100) -> None:
+        self.workspace = workspace
+        self.page_size = page_size
+        self.calls: Counter = Counter()
+        self.bytes_sent: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-weeek", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def __enter__(self) -> "FakeWeeekServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def snapshot(self) -> tuple[Counter, Counter]:
+        with self._lock:
+            return Counter(self.calls), Counter(self.bytes_sent)
+
+    def _record(self, endpoint: str, payload_size: int) -> None:
+        with self._lock:
+            self.calls[endpoint] += 1
+            self.bytes_sent[endpoint] += payload_size
+
+    def build_response(self, path: str, query: dict[str, list[str]]) -> tuple[str, dict] | None:
+        if path.endswith("ws/members"):
+            return "ws/members", {"success": True, "members": self.workspace["members"]}
+        if path.endswith("tm/board-columns"):
+            board_id = int(query.get("boardId", ["0"])[0])
+            return "tm/board-columns", {"success": True, "boardColumns": self.workspace["board_columns"].get(board_id, [])}
+        if "tm/tasks/" in path:
+            task_id = path.rsplit("/", 1)[-1]
+            task = next((task for task in self.workspace["tasks"] if str(task["id"]) == task_id), None)
+            return "tm/tasks/{id}", {"success": task is not None, "task": task}
+        if path.endswith("tm/tasks"):
+            offset = int(query.get("cursor", ["0"])[0])
+            tasks_page = self.workspace["tasks"][offset:offset + self.page_size]
+            next_offset = offset + len(tasks_page)
+            has_more = next_offset < len(self.workspace["tasks"])
+            return "tm/tasks", {
+                "success": True, "tasks": tasks_page, "hasMore": has_more,
+                "cursor": str(next_offset) if has_more else None,
+            }
+        return None
+
+    def _make_handler(self) -> type:
+        fake_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                parsed_url = urlparse(self.path)
+                response = fake_server.build_response(parsed_url.path, parse_qs(parsed_url.query))
+                if response is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                endpoint, body = response
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                fake_server._record(endpoint, len(payload))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+class FakeSheetsRecorder:
+    def __init__(self) -> None:
+        self.calls: Counter = Counter()
+        self.bytes_sent: Counter = Counter()
+        self.batch_requests = 0
+
+    def record(self, method: str, payload: object) -> None:
+        self.calls[method] += 1
+        self.bytes_sent[method] += len(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"))
+
+    def snapshot(self) -> tuple[Counter, Counter]:
+        return Counter(self.calls), Counter(self.bytes_sent)
+
+class FakeWorksheet:
+    def __init__(self, recorder: FakeSheetsRecorder, title: str, rows: int, cols: int, sheet_gid: int) -> None:
+        self.recorder = recorder
+        self.title = title
+        self.id = sheet_gid
+        self.row_count = rows
+        self.col_count = cols
+        self.values: list[list] = []
+
+    def clear(self) -> None:
+        self.recorder.record("values.clear", None)
+        self.values = []
+
+    def update(self, values: list[list], range_name: str | None = None, **kwargs) -> dict:
+        self.recorder.record("values.update", values)
+        first_row = int(range_name.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ")) - 1 if range_name else 0
+        self.values[first_row:first_row + len(values)] = [list(row) for row in values]
+        return {}
+
+    def batch_update(self, data: list[dict], **kwargs) -> dict:
+        self.recorder.record("values.batchUpdate", data)
+        return {}
+
+    def get_all_values(self, **kwargs) -> list[list]:
+        self.recorder.record("values.get", None)
+        return [list(row) for row in self.values]
+
+class FakeSpreadsheet:
+    def __init__(self, recorder: FakeSheetsRecorder) -> None:
+        self.recorder = recorder
+        self.worksheets: dict[str, FakeWorksheet] = {}
+        self.conditional_formats: list[dict] = []
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        if title not in self.worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title: str, rows: str, cols: str) -> FakeWorksheet:
+        self.recorder.record("spreadsheets.batchUpdate", {"addSheet": title})
+        self.worksheets[title] = FakeWorksheet(self.recorder, title, int(rows), int(cols), len(self.worksheets) + 1)
+        return self.worksheets[title]
+
+    def fetch_sheet_metadata(self, params: dict | None = None) -> dict:
+        self.recorder.record("spreadsheets.get", params)
+        return {"sheets": [
+            {"properties": {"sheetId": worksheet.id}, "conditionalFormats": self.conditional_formats}
+            for worksheet in self.worksheets.values()
+        ]}
+
+    def batch_update(self, body: dict) -> dict:
+        self.recorder.record("spreadsheets.batchUpdate", body)
+        self.recorder.batch_requests += len(body.get("requests", []))
+        return {}
+
+class FakeSheetsClient:
+    def __init__(self) -> None:
+        self.recorder = FakeSheetsRecorder()
+        self.spreadsheet = FakeSpreadsheet(self.recorder)
+
+    def open_by_key(self, sheet_id: str) -> FakeSpreadsheet:
+        self.recorder.record("spreadsheets.get", sheet_id)
+        return self.spreadsheet
+
+def measure_stage(results: list[dict], stage_name: str, stage_call, counters_source) -> object:
+    calls_before, bytes_before = counters_source()
+    tracemalloc.reset_peak()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    started_at = time.perf_counter()
+    stage_result = stage_call()
+    wall_seconds = time.perf_counter() - started_at
+    peak_memory = tracemalloc.get_traced_memory()[1] - memory_before
+    calls_after, bytes_after = counters_source()
+    results.append({
+        "stage": stage_name,
+        "wall_seconds": round(wall_seconds, 4),
+        "api_calls": sum((calls_after - calls_before).values()),
+        "payload_bytes": sum((bytes_after - bytes_before).values()),
+        "peak_memory_bytes": max(0, peak_memory),
+        "calls_by_endpoint": dict(calls_after - calls_before),
+    })
+    return stage_result
+
+def run_benchmark(args: argparse.Namespace) -> list[dict]:
+    workspace = generate_synthetic_workspace(
+        args.tasks, args.boards, args.members, args.workloads_per_task, seed=args.seed
+    )
+    periods = report.get_reporting_periods(date.today())
+    headers = report.build_report_headers(*periods)
+    sheets_client = FakeSheetsClient()
+    results: list[dict] = []
+
+    tracemalloc.start()
+    try:
+        with FakeWeeekServer(workspace, page_size=args.page_size) as weeek_server:
+            report.WEEEK_API_BASE_URL = weeek_server.base_url
+            members = measure_stage(
+                results, "fetch_workspace_members",
+                lambda: report.fetch_workspace_members(BENCHMARK_TOKEN), weeek_server.snapshot
+            )
+            tasks = measure_stage(
+                results, "fetch_all_tasks",
+                lambda: report.fetch_all_tasks(BENCHMARK_TOKEN), weeek_server.snapshot
+            )
+            board_ids = {task.board_id for task in tasks if task.board_id is not None}
+            board_cols_map = measure_stage(
+                results, "fetch_board_column_names",
+                lambda: report.fetch_board_column_names(board_ids, BENCHMARK_TOKEN), weeek_server.snapshot
+            )
+            sheet_rows = measure_stage(
+                results, "process_tasks_to_sheet_rows",
+                lambda: report.process_tasks_to_sheet_rows(tasks, members, board_cols_map, *periods),
+                weeek_server.snapshot
+            )
+            del tasks
+            measure_stage(
+                results, "stream_task_rows",
+                lambda: sum(len(page_rows) for page_rows in report.stream_task_rows(BENCHMARK_TOKEN, members, periods)),
+                weeek_server.snapshot
+            )
+        measure_stage(
+            results, "update_google_sheet",
+            lambda: report.update_google_sheet(sheets_client, BENCHMARK_SHEET_ID, report.SHEET_NAME, headers, sheet_rows),
+            sheets_client.recorder.snapshot
+        )
+        if args.diff_write:
+            changed_rows = [list(row) for row in sheet_rows]
+            for row in changed_rows[::max(1, len(changed_rows) // 20)]:
+                row[2] = "Изменено"
+            measure_stage(
+                results, "update_google_sheet (diff)",
+                lambda: report.update_google_sheet(
+                    sheets_client, BENCHMARK_SHEET_ID, report.SHEET_NAME, headers, changed_rows, diff_write=True
+                ),
+                sheets_client.recorder.snapshot
+            )
+    finally:
+        tracemalloc.stop()
+    return results
+
+def print_results(results: list[dict]) -> None:
+    print(f"{'Этап':<32} {'Время, с':>10} {'Вызовов API':>12} {'Байт':>14} {'Пик памяти, МБ':>16}")
+    for result in results:
+        print(
+            f"{result['stage']:<32} {result['wall_seconds']:>10.3f} {result['api_calls']:>12} "
+            f"{result['payload_bytes']:>14} {result['peak_memory_bytes'] / 1024 / 1024:>16.1f}"
+        )
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    arg_parser = argparse.ArgumentParser(description="Нагрузочный тест генератора отчетов WEEEK на синтетических данных.")
+    arg_parser.add_argument("--tasks", type=int, default=5000, help="Количество задач.")
+    arg_parser.add_argument("--boards", type=int, default=200, help="Количество досок.")
+    arg_parser.add_argument("--members", type=int, default=30, help="Количество участников.")
+    arg_parser.add_argument("--workloads-per-task", type=int, default=5, help="Среднее количество записей времени на задачу.")
+    arg_parser.add_argument("--page-size", type=int, default=100, help="Размер страницы tm/tasks.")
+    arg_parser.add_argument("--seed", type=int, default=42, help="Зерно генератора случайных чисел.")
+    arg_parser.add_argument("--diff-write", action="store_true", help="Дополнительно измерить запись с --diff-write.")
+    arg_parser.add_argument("--json", dest="json_path", help="Сохранить результаты в JSON-файл.")
+    return arg_parser.parse_args(argv)
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    logging.getLogger(report.__name__).setLevel(logging.WARNING)
+    results = run_benchmark(args)
+    print_results(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as json_file:
+            json.dump({"parameters": vars(args), "stages": results}, json_file, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
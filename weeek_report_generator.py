@@ -1,15 +1,43 @@
+import abc
+import argparse
+import bisect
+import contextlib
+import contextvars
+import cProfile
+import csv
+import functools
+import hashlib
+import hmac
+import ipaddress
+import itertools
+import json
 import logging
 import math
 import os
+import queue
+import random
+import re
+import signal
+import sqlite3
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from datetime import date, timedelta 
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, NamedTuple
+from email.utils import parsedate_to_datetime
 
 import requests 
+from requests.adapters import HTTPAdapter
 from dateutil import parser as date_parser
 from dateutil.relativedelta import relativedelta
 from dotenv import load_dotenv
 
-import gspread
-from google.oauth2.service_account import Credentials 
+if TYPE_CHECKING:
+    import gspread
 
 WEEEK_API_BASE_URL: str = "https://api.weeek.net/public/v1/"
 API_TOKEN_ENV_NAME: str = "WEEEK_API_TOKEN"
@@ -18,6 +46,72 @@ ENV_FILE_PATH: str = ".env"
 GOOGLE_SHEET_ID_ENV_NAME: str = "GOOGLE_SHEET_ID"
 GOOGLE_CREDENTIALS_FILENAME_ENV_NAME: str = "GOOGLE_CREDENTIALS_FILENAME"
 SHEET_NAME: str = "Отчет WEEEK"
+DEFAULT_MAX_PARALLEL_TARGETS: int = 4
+
+OUTPUT_SHEETS: str = "sheets"
+EXPORT_PATH_TEMPLATE: str = "{target} - {sheet}.{format}"
+PARQUET_ROW_GROUP_SIZE: int = 50_000
+SHEET_NUMERIC_HEADER_PREFIXES: tuple[str, ...] = ("Оценка времени", "Затрекано (")
+
+BACKFILL_SHEET_NAME_TEMPLATE: str = "{sheet_name} {start:%d.%m.%Y}-{end:%d.%m.%Y}"
+
+DAEMON_DEFAULT_INTERVAL_SECONDS: int = 15 * 60
+DAEMON_DEFAULT_LISTEN: str = "127.0.0.1:8787"
+DAEMON_TRIGGER_DEBOUNCE_SECONDS: float = 2.0
+WEBHOOK_SECRET_ENV_NAME: str = "WEEEK_WEBHOOK_SECRET"
+WEBHOOK_MAX_BODY_BYTES: int = 1024 * 1024
+WEBHOOK_MAX_TASK_IDS: int = 100
+TASK_ID_PATTERN: re.Pattern = re.compile(r"^[A-Za-z0-9_-]+$")
+
+MAX_WORKERS_ENV_NAME: str = "WEEEK_MAX_WORKERS"
+DEFAULT_MAX_WORKERS: int = 8
+
+API_MAX_RETRIES_ENV_NAME: str = "WEEEK_API_MAX_RETRIES"
+DEFAULT_API_MAX_RETRIES: int = 5
+API_RATE_LIMIT_ENV_NAME: str = "WEEEK_API_RATE_LIMIT"
+DEFAULT_API_RATE_LIMIT: float = 5.0
+API_BACKOFF_BASE_SECONDS: float = 1.0
+API_BACKOFF_MAX_SECONDS: float = 60.0
+API_DEFAULT_TIMEOUT_SECONDS: float = 30.0
+API_ENDPOINT_TIMEOUTS: dict[str, float] = {
+    "tm/tasks": 60.0, "tm/board-columns": 15.0, "ws/members": 15.0
+}
+API_RETRYABLE_STATUS_CODES: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+API_THROTTLED_STATUS_CODES: frozenset[int] = frozenset({429})
+API_ENDPOINT_ID_SEGMENT_PATTERN: re.Pattern = re.compile(r"(?<=^tm/tasks)/[^/]+$")
+
+CACHE_DIR_ENV_NAME: str = "WEEEK_CACHE_DIR"
+DEFAULT_CACHE_DIR: str = ".weeek_cache"
+CACHE_TTL_ENV_NAME: str = "WEEEK_CACHE_TTL"
+DEFAULT_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+CACHE_MAX_ENTRIES_ENV_NAME: str = "WEEEK_CACHE_MAX_ENTRIES"
+DEFAULT_CACHE_MAX_ENTRIES: int = 5000
+METADATA_CACHE_FILENAME: str = "metadata.json"
+
+TASK_STORE_FILENAME_TEMPLATE: str = "tasks_{workspace_key}.sqlite3"
+FULL_RESYNC_INTERVAL_ENV_NAME: str = "WEEEK_FULL_RESYNC_INTERVAL"
+DEFAULT_FULL_RESYNC_INTERVAL_SECONDS: int = 24 * 60 * 60
+TASKS_UPDATED_SINCE_PARAM: str = "updatedAfter"
+TASK_PAGE_PREFETCH_DEPTH: int = 1
+TASK_BATCH_SIZE: int = 1000
+TASK_REPORT_FIELDS: tuple[str, ...] = (
+    "id", "title", "priority", "userId", "boardId", "boardColumnId",
+    "createdAt", "updatedAt", "isCompleted", "duration", "workloads", "timeEntries",
+)
+
+SHEETS_WRITE_QUOTA_ENV_NAME: str = "GOOGLE_SHEETS_WRITE_QUOTA_PER_MINUTE"
+DEFAULT_SHEETS_WRITE_QUOTA_PER_MINUTE: int = 60
+SHEETS_QUOTA_WINDOW_SECONDS: float = 60.0
+SHEETS_MAX_RETRIES: int = 5
+SHEETS_IDEMPOTENT_REQUEST_KINDS: frozenset[str] = frozenset({"repeatCell", "autoResizeDimensions"})
+SHEETS_BATCH_MAX_REQUESTS: int = 500
+SHEETS_BATCH_MAX_BYTES: int = 2 * 1024 * 1024
+SHEET_PRESERVED_HEADERS: frozenset[str] = frozenset({"Стоимость в час", "Расчет зп"})
+SHEET_TASK_ID_PATTERN: re.Pattern = re.compile(r"\(([^()]*)\)\s*$")
+SHEET_DATE_PATTERN: re.Pattern = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+SHEET_SERIAL_EPOCH: date = date(1899, 12, 30)
+
+METRICS_PREFIX: str = "weeek_report"
 
 PRIORITY_MAP: dict[int, str] = {
     0: "Низкий", 1: "Средний", 2: "Высокий", 3: "Замороженный"
@@ -46,33 +140,512 @@ def get_env_variable(var_name: str, is_critical: bool = True) -> str | None:
         logger.warning(f"Необязательная переменная окружения '{var_name}' не установлена.")
     return value
 
+class RunMetrics:
+    def __init__(self, run_name: str = "default") -> None:
+        self.run_name = run_name
+        self.started_at = time.time()
+        self.phase_seconds: Counter = Counter()
+        self.phase_calls: Counter = Counter()
+        self.counters: Counter = Counter()
+        self.gauges: dict[tuple[str, tuple], float] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, phase_name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            with self._lock:
+                self.phase_seconds[phase_name] += elapsed
+                self.phase_calls[phase_name] += 1
+
+    def increment(self, counter_name: str, value: float = 1, **labels: str) -> None:
+        with self._lock:
+            self.counters[(counter_name, tuple(sorted(labels.items())))] += value
+
+    def set_gauge(self, gauge_name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            self.gauges[(gauge_name, tuple(sorted(labels.items())))] = value
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "run": self.run_name,
+                "started_at": self.started_at,
+                "phases": {
+                    phase_name: {"seconds": round(seconds, 6), "calls": self.phase_calls[phase_name]}
+                    for phase_name, seconds in self.phase_seconds.items()
+                },
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.gauges.items())
+                ],
+            }
+
+    def iter_prometheus_samples(self) -> Iterator[tuple[str, dict, float]]:
+        summary = self.to_dict()
+        run_label = {"run": self.run_name}
+        for phase_name, phase_data in summary["phases"].items():
+            yield "phase_seconds", {**run_label, "phase": phase_name}, phase_data["seconds"]
+            yield "phase_calls_total", {**run_label, "phase": phase_name}, phase_data["calls"]
+        for metric in summary["counters"] + summary["gauges"]:
+            yield metric["name"], {**run_label, **metric["labels"]}, metric["value"]
+
+def escape_label_value(label_value: object) -> str:
+    return str(label_value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_prometheus_metrics(metrics_list: Sequence[RunMetrics]) -> str:
+    samples: dict[str, list[tuple[dict, float]]] = {}
+    for metrics in metrics_list:
+        for metric_name, labels, value in metrics.iter_prometheus_samples():
+            samples.setdefault(metric_name, []).append((labels, value))
+    lines = []
+    for metric_name, metric_samples in samples.items():
+        metric_type = "counter" if metric_name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {METRICS_PREFIX}_{metric_name} {metric_type}")
+        for labels, value in metric_samples:
+            label_text = ",".join(
+                f'{key}="{escape_label_value(label_value)}"'
+                for key, label_value in labels.items()
+            )
+            lines.append(f"{METRICS_PREFIX}_{metric_name}{{{label_text}}} {value}")
+    return "\n".join(lines) + "\n"
+
+_run_metrics: contextvars.ContextVar[RunMetrics | None] = contextvars.ContextVar("weeek_run_metrics", default=None)
+
+def get_run_metrics() -> RunMetrics:
+    metrics = _run_metrics.get()
+    if metrics is None:
+        metrics = RunMetrics()
+        _run_metrics.set(metrics)
+    return metrics
+
+def timed_phase(phase_name: str) -> Callable:
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_run_metrics().phase(phase_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def write_text_atomically(file_path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as output_file:
+        output_file.write(content)
+    os.replace(tmp_path, file_path)
+
+def export_run_metrics(metrics_list: Sequence[RunMetrics], json_path: str | None, prometheus_path: str | None) -> None:
+    try:
+        if json_path:
+            run_summaries = {"runs": [metrics.to_dict() for metrics in metrics_list]}
+            write_text_atomically(json_path, json.dumps(run_summaries, ensure_ascii=False, indent=2))
+        if prometheus_path:
+            write_text_atomically(prometheus_path, format_prometheus_metrics(metrics_list))
+    except OSError as e:
+        logger.error(f"Не удалось сохранить метрики выполнения: {e}")
+
+def get_numeric_env_variable(var_name: str, default: int | float, minimum: int | float) -> int | float:
+    raw_value = os.getenv(var_name)
+    if not raw_value:
+        return default
+    try:
+        return max(minimum, type(default)(raw_value))
+    except ValueError:
+        logger.warning(f"Некорректное значение '{var_name}': '{raw_value}'. Используется {default}.")
+        return default
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait_seconds = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+    def block_for(self, seconds: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = 0.0
+            self._blocked_until = max(self._blocked_until, now + seconds)
+
+_http_session: requests.Session | None = None
+_http_pool_size: int | None = None
+_rate_limiters: dict[str, TokenBucket] = {}
+_http_session_lock = threading.Lock()
+
+def get_max_workers() -> int:
+    return get_numeric_env_variable(MAX_WORKERS_ENV_NAME, DEFAULT_MAX_WORKERS, 1)
+
+def mount_http_adapters(session: requests.Session, pool_size: int) -> None:
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+def get_http_session() -> requests.Session:
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            mount_http_adapters(session, _http_pool_size or get_max_workers() + 1)
+            _http_session = session
+        return _http_session
+
+def set_http_pool_size(pool_size: int) -> None:
+    global _http_pool_size
+    with _http_session_lock:
+        _http_pool_size = pool_size
+        if _http_session is not None:
+            mount_http_adapters(_http_session, pool_size)
+
+def get_rate_limiter(token: str) -> TokenBucket:
+    with _http_session_lock:
+        rate_limiter = _rate_limiters.get(token)
+        if rate_limiter is None:
+            rate = get_numeric_env_variable(API_RATE_LIMIT_ENV_NAME, DEFAULT_API_RATE_LIMIT, 0.1)
+            rate_limiter = _rate_limiters[token] = TokenBucket(rate=rate, capacity=max(1.0, rate))
+        return rate_limiter
+
+def get_endpoint_timeout(endpoint: str) -> float:
+    endpoint_path = endpoint.split("?", 1)[0]
+    return API_ENDPOINT_TIMEOUTS.get(endpoint_path, API_DEFAULT_TIMEOUT_SECONDS)
+
+def compute_backoff_delay(attempt: int) -> float:
+    return random.uniform(0, min(API_BACKOFF_MAX_SECONDS, API_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def parse_retry_after(response: requests.Response) -> float | None:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                return max(0.0, retry_at.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    reset = response.headers.get("X-RateLimit-Reset")
+    if remaining is not None and reset and remaining.strip() == "0":
+        try:
+            reset_value = float(reset)
+        except ValueError:
+            return None
+        return max(0.0, reset_value - time.time()) if reset_value > 1e9 else reset_value
+    return None
+
 def make_api_request(endpoint: str, token: str, params: dict | None = None) -> dict | None:
     headers = {"Authorization": f"Bearer {token}"}
     target_url = WEEEK_API_BASE_URL + endpoint
-    try:
-        response = requests.get(target_url, headers=headers, params=params, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as http_err:
-        logger.error(f"HTTP ошибка для {target_url}: {http_err}")
-        logger.error(f"Тело ответа: {response.text if hasattr(response, 'text') else 'N/A'}")
-    except requests.exceptions.Timeout:
-        logger.error(f"Таймаут запроса для {target_url}")
-    except requests.exceptions.RequestException as req_err:
-        logger.error(f"Ошибка запроса для {target_url}: {req_err}")
-    except ValueError as json_err:
-        logger.error(f"Ошибка декодирования JSON от {target_url}: {json_err}")
-        content = response.text if 'response' in locals() and hasattr(response, 'text') else 'N/A'
-        logger.error(f"Тело ответа: {content[:500]}...")
+    timeout = get_endpoint_timeout(endpoint)
+    max_retries = get_numeric_env_variable(API_MAX_RETRIES_ENV_NAME, DEFAULT_API_MAX_RETRIES, 0)
+    rate_limiter = get_rate_limiter(token)
+    metrics = get_run_metrics()
+    endpoint_path = API_ENDPOINT_ID_SEGMENT_PATTERN.sub("/{id}", endpoint.split("?", 1)[0])
+    for attempt in range(max_retries + 1):
+        if attempt:
+            metrics.increment("weeek_api_retries_total", endpoint=endpoint_path)
+        rate_limiter.acquire()
+        retry_delay: float | None = None
+        try:
+            with metrics.phase("weeek_api_request"):
+                response = get_http_session().get(target_url, headers=headers, params=params, timeout=timeout)
+            metrics.increment("weeek_api_requests_total", endpoint=endpoint_path, status=str(response.status_code))
+            metrics.increment("weeek_api_response_bytes_total", len(response.content), endpoint=endpoint_path)
+            server_delay = parse_retry_after(response)
+            if response.status_code in API_RETRYABLE_STATUS_CODES:
+                if server_delay is not None:
+                    rate_limiter.block_for(server_delay)
+                retry_delay = server_delay if server_delay is not None else compute_backoff_delay(attempt)
+                logger.warning(f"HTTP {response.status_code} для {target_url} (попытка {attempt + 1}/{max_retries + 1}).")
+            else:
+                response.raise_for_status()
+                if server_delay is not None:
+                    rate_limiter.block_for(server_delay)
+                return response.json()
+        except requests.exceptions.HTTPError as http_err:
+            logger.error(f"HTTP ошибка для {target_url}: {http_err}")
+            logger.error(f"Тело ответа: {response.text if hasattr(response, 'text') else 'N/A'}")
+            return None
+        except requests.exceptions.Timeout:
+            logger.warning(f"Таймаут запроса для {target_url} (попытка {attempt + 1}/{max_retries + 1}).")
+            retry_delay = compute_backoff_delay(attempt)
+        except requests.exceptions.ConnectionError as conn_err:
+            logger.warning(f"Ошибка соединения для {target_url} (попытка {attempt + 1}/{max_retries + 1}): {conn_err}")
+            retry_delay = compute_backoff_delay(attempt)
+        except requests.exceptions.RequestException as req_err:
+            logger.error(f"Ошибка запроса для {target_url}: {req_err}")
+            return None
+        except ValueError as json_err:
+            logger.error(f"Ошибка декодирования JSON от {target_url}: {json_err}")
+            content = response.text if 'response' in locals() and hasattr(response, 'text') else 'N/A'
+            logger.error(f"Тело ответа: {content[:500]}...")
+            return None
+        if attempt < max_retries:
+            time.sleep(retry_delay)
+    logger.error(f"Запрос к {target_url} не выполнен после {max_retries + 1} попыток.")
+    metrics.increment("weeek_api_failures_total", endpoint=endpoint_path)
     return None
 
+class MetadataCache:
+    def __init__(self, file_path: str, ttl_seconds: float, max_entries: int, refresh: bool = False) -> None:
+        self.file_path = file_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self._entries: dict[str, dict] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, encoding="utf-8") as cache_file:
+                entries = json.load(cache_file)
+            if isinstance(entries, dict):
+                self._entries = entries
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать кэш метаданных '{self.file_path}': {e}. Кэш будет пересоздан.")
+
+    def get(self, key: str) -> object | None:
+        if self.refresh:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.time()
+            if entry is None or now - entry.get("stored_at", 0) > self.ttl_seconds:
+                get_run_metrics().increment("metadata_cache_misses_total")
+                return None
+            get_run_metrics().increment("metadata_cache_hits_total")
+            entry["accessed_at"] = now
+            self._dirty = True
+            return entry.get("value")
+
+    def set(self, key: str, value: object) -> None:
+        with self._lock:
+            now = time.time()
+            self._entries[key] = {"stored_at": now, "accessed_at": now, "value": value}
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            live_entries = {
+                key: entry for key, entry in self._entries.items()
+                if now - entry.get("stored_at", 0) <= self.ttl_seconds
+            }
+            if len(live_entries) > self.max_entries:
+                newest_keys = sorted(live_entries, key=lambda key: live_entries[key].get("accessed_at", 0), reverse=True)
+                live_entries = {key: live_entries[key] for key in newest_keys[:self.max_entries]}
+            self._entries = live_entries
+            try:
+                os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+                tmp_path = f"{self.file_path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as cache_file:
+                    json.dump(live_entries, cache_file, ensure_ascii=False)
+                os.replace(tmp_path, self.file_path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning(f"Не удалось сохранить кэш метаданных '{self.file_path}': {e}")
+
+class TaskPaginationError(Exception):
+    pass
+
+class TaskStore:
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(file_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.snapshot_lock = threading.RLock()
+        with self._lock, self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    board_id TEXT,
+                    updated_at TEXT,
+                    data TEXT NOT NULL
+                );
+                DROP INDEX IF EXISTS tasks_position;
+                CREATE INDEX IF NOT EXISTS tasks_position_id ON tasks (position, id);
+                CREATE TABLE IF NOT EXISTS tasks_staging (
+                    id TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    board_id TEXT,
+                    updated_at TEXT,
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def get_state(self, key: str) -> str | None:
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value)
+            )
+
+    def count_tasks(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def get_high_water_mark(self) -> str | None:
+        with self._lock:
+            row = self._connection.execute("SELECT MAX(updated_at) FROM tasks").fetchone()
+        return row[0] if row else None
+
+    def upsert_tasks(self, tasks: list[dict]) -> int:
+        return self._write_tasks("tasks", tasks, keep_positions=True)
+
+    def stage_tasks(self, tasks: list[dict]) -> int:
+        return self._write_tasks("tasks_staging", tasks, keep_positions=False)
+
+    def _write_tasks(self, table_name: str, tasks: list[dict], keep_positions: bool) -> int:
+        with self._lock, self._connection:
+            first_position = self._connection.execute(
+                f"SELECT COALESCE(MAX(position), -1) + 1 FROM {table_name}"
+            ).fetchone()[0]
+            rows = []
+            for task in tasks:
+                task_id = task.get("id")
+                if task_id is None:
+                    continue
+                board_id = task.get("boardId")
+                rows.append((
+                    str(task_id), first_position + len(rows),
+                    str(board_id) if board_id is not None else None,
+                    task.get("updatedAt"), json.dumps(select_task_fields(task), ensure_ascii=False)
+                ))
+            position_update = "" if keep_positions else "position = excluded.position, "
+            self._connection.executemany(
+                f"INSERT INTO {table_name} (id, position, board_id, updated_at, data) VALUES (?, ?, ?, ?, ?) "
+                f"ON CONFLICT(id) DO UPDATE SET {position_update}board_id = excluded.board_id, "
+                "updated_at = excluded.updated_at, data = excluded.data", rows
+            )
+        return len(rows)
+
+    def discard_staged_tasks(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM tasks_staging")
+
+    def replace_with_staged_tasks(self) -> int:
+        with self._lock, self._connection:
+            deleted_count = self._connection.execute(
+                "SELECT COUNT(*) FROM tasks WHERE id NOT IN (SELECT id FROM tasks_staging)"
+            ).fetchone()[0]
+            self._connection.execute("DELETE FROM tasks")
+            self._connection.execute(
+                "INSERT INTO tasks (id, position, board_id, updated_at, data) "
+                "SELECT id, position, board_id, updated_at, data FROM tasks_staging"
+            )
+            self._connection.execute("DELETE FROM tasks_staging")
+        return deleted_count
+
+    def get_board_ids(self) -> set[str]:
+        with self._lock:
+            rows = self._connection.execute("SELECT DISTINCT board_id FROM tasks WHERE board_id IS NOT NULL").fetchall()
+        return {row[0] for row in rows}
+
+    def iter_tasks(self, batch_size: int = 500) -> Iterator["TaskRecord"]:
+        last_position, last_id = -1, ""
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT position, id, data FROM tasks WHERE (position, id) > (?, ?) "
+                    "ORDER BY position, id LIMIT ?",
+                    (last_position, last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, _, data in rows:
+                yield decode_task(json.loads(data))
+            last_position, last_id = rows[-1][0], rows[-1][1]
+
+def get_workspace_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+def get_cache_dir() -> str:
+    return os.getenv(CACHE_DIR_ENV_NAME) or DEFAULT_CACHE_DIR
+
+def create_metadata_cache(refresh: bool = False) -> MetadataCache:
+    return MetadataCache(
+        os.path.join(get_cache_dir(), METADATA_CACHE_FILENAME),
+        ttl_seconds=get_numeric_env_variable(CACHE_TTL_ENV_NAME, DEFAULT_CACHE_TTL_SECONDS, 0),
+        max_entries=get_numeric_env_variable(CACHE_MAX_ENTRIES_ENV_NAME, DEFAULT_CACHE_MAX_ENTRIES, 1),
+        refresh=refresh,
+    )
+
+def open_workspace_task_stores(targets: Iterable["ReportTarget"]) -> dict[str, TaskStore]:
+    task_stores: dict[str, TaskStore] = {}
+    for target in targets:
+        workspace_key = get_workspace_key(target.weeek_token)
+        if workspace_key not in task_stores:
+            task_stores[workspace_key] = open_task_store(target.weeek_token)
+    return task_stores
+
+def open_task_store(token: str) -> TaskStore:
+    file_name = TASK_STORE_FILENAME_TEMPLATE.format(workspace_key=get_workspace_key(token))
+    return TaskStore(os.path.join(get_cache_dir(), file_name))
+
 def parse_date_string(date_str: str | None) -> date | None:
     if not date_str: return None
+    if isinstance(date_str, str) and len(date_str) >= 10 and date_str[4] == "-" and date_str[7] == "-":
+        try: return date(int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10]))
+        except ValueError: pass
     try: return date_parser.parse(date_str).date()
     except (ValueError, TypeError):
         logger.warning(f"Не удалось преобразовать строку в дату: '{date_str}'")
         return None
 
+@functools.lru_cache(maxsize=8192)
+def parse_date_ordinal(date_str: str | None) -> int | None:
+    parsed_date = parse_date_string(date_str)
+    return parsed_date.toordinal() if parsed_date else None
+
 def get_reporting_periods(current_date: date) -> tuple[tuple[date, date], tuple[date, date]]:
     day_of_month = current_date.day
     p1_start_day, p1_end_day = 6, 20
@@ -86,26 +659,46 @@ def get_reporting_periods(current_date: date) -> tuple[tuple[date, date], tuple[
     period2_end = date(p2_end_month_base.year, p2_end_month_base.month, p2_end_day)
     return (period1_start, period1_end), (period2_start, period2_end)
 
-def fetch_weeek_data(token: str) -> tuple[dict[str, str], list[dict], dict[tuple[int, int], str]]:
-    logger.info("Начало загрузки данных из WEEEK API...")
-    members_map = fetch_workspace_members(token)
-    tasks_data = fetch_all_tasks(token)
+def get_half_month_periods(start_date: date, end_date: date) -> list[tuple[date, date]]:
+    first_period, _ = get_reporting_periods(start_date)
+    month_base = first_period[0] - relativedelta(months=1)
+    half_month_periods: list[tuple[date, date]] = []
+    while month_base <= end_date:
+        for period_start, period_end in get_reporting_periods(month_base):
+            if period_start <= end_date and period_end >= start_date:
+                half_month_periods.append((period_start, period_end))
+        month_base += relativedelta(months=1)
+    return half_month_periods
+
+def normalize_board_id(board_id: object) -> int | None:
+    if isinstance(board_id, int):
+        return board_id
+    try:
+        return int(board_id)
+    except (ValueError, TypeError):
+        logger.warning(f"Обнаружен некорректный boardId: {board_id} (тип: {type(board_id)}), который не может быть преобразован в int. Пропуск.")
+        return None
+
+@timed_phase("fetch_board_column_names")
+def fetch_board_column_names(
+    board_ids: set, token: str, max_workers: int | None = None, cache: MetadataCache | None = None
+) -> dict[tuple[int, int], str]:
+    board_ids_int = list(dict.fromkeys(
+        board_id_int for board_id_int in map(normalize_board_id, board_ids) if board_id_int is not None
+    ))
+
     board_column_names_map: dict[tuple[int, int], str] = {}
-    if tasks_data:
-        unique_board_ids = {
-            task.get("boardId") for task in tasks_data if task.get("boardId") is not None
-        }
-        for board_id in unique_board_ids:
-            if not isinstance(board_id, int):
-                try:
-                    board_id_int = int(board_id)
-                except (ValueError, TypeError):
-                    logger.warning(f"Обнаружен некорректный boardId: {board_id} (тип: {type(board_id)}), который не может быть преобразован в int. Пропуск.")
-                    continue
-            else:
-                board_id_int = board_id
+    if not board_ids_int:
+        return board_column_names_map
 
-            columns = fetch_board_columns_for_board(board_id_int, token)
+    workers = min(max_workers or get_max_workers(), len(board_ids_int))
+    logger.info(f"Загрузка колонок для {len(board_ids_int)} досок ({workers} потоков)...")
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="weeek-columns",
+        initializer=_run_metrics.set, initargs=(get_run_metrics(),)
+    ) as executor:
+        board_columns = executor.map(lambda board_id: fetch_board_columns_for_board(board_id, token, cache), board_ids_int)
+        for board_id_int, columns in zip(board_ids_int, board_columns):
             for column in columns:
                 col_id = column.get("id")
                 if isinstance(col_id, int): 
@@ -113,11 +706,16 @@ def fetch_weeek_data(token: str) -> tuple[dict[str, str], list[dict], dict[tuple
                     board_column_names_map[(board_id_int, col_id)] = column_name
                 elif col_id is not None:
                      logger.warning(f"ID колонки {col_id} для доски {board_id_int} не является числом. Пропуск колонки.")
+    return board_column_names_map
 
-    logger.info("Загрузка данных из WEEEK API завершена.")
-    return members_map, tasks_data, board_column_names_map
-
-def fetch_workspace_members(token: str) -> dict[str, str]:
+@timed_phase("fetch_workspace_members")
+def fetch_workspace_members(token: str, cache: MetadataCache | None = None) -> dict[str, str]:
+    cache_key = f"{get_workspace_key(token)}:members"
+    if cache is not None:
+        cached_members = cache.get(cache_key)
+        if cached_members is not None:
+            logger.info("Участники рабочей области загружены из кэша.")
+            return cached_members
     logger.info("Загрузка участников рабочей области...")
     data = make_api_request("ws/members", token)
     member_map: dict[str, str] = {}
@@ -126,124 +724,388 @@ def fetch_workspace_members(token: str) -> dict[str, str]:
             member_id, first_name = member.get("id"), member.get("firstName")
             if member_id:
                 member_map[member_id] = first_name if first_name else member_id
+        if cache is not None:
+            cache.set(cache_key, member_map)
     else:
         logger.error("Не удалось загрузить участников рабочей области.")
     return member_map
 
-def fetch_board_columns_for_board(board_id: int | str, token: str) -> list[dict]:
+@timed_phase("fetch_board_columns_for_board")
+def fetch_board_columns_for_board(board_id: int | str, token: str, cache: MetadataCache | None = None) -> list[dict]:
+    cache_key = f"{get_workspace_key(token)}:board-columns:{board_id}"
+    if cache is not None:
+        cached_columns = cache.get(cache_key)
+        if cached_columns is not None:
+            return cached_columns
     data = make_api_request(f"tm/board-columns?boardId={board_id}", token)
     columns_list: list[dict] = []
     if data and data.get("success") and "boardColumns" in data:
         columns_list = data["boardColumns"]
+        if cache is not None:
+            cache.set(cache_key, [{"id": column.get("id"), "name": column.get("name")} for column in columns_list])
     else:
         logger.warning(f"Не удалось загрузить колонки для доски ID: {board_id}.")
     return columns_list
 
-def fetch_all_tasks(token: str) -> list[dict]:
-    logger.info("Загрузка списка задач...")
-    all_tasks_list: list[dict] = []
+def iter_task_pages(token: str, extra_params: dict | None = None) -> Iterator[list[dict]]:
     cursor: str | None = None
     page_num = 0
     while True:
         page_num += 1
-        params = {"cursor": cursor} if cursor else {}
-        data = make_api_request("tm/tasks", token, params=params)
+        params = dict(extra_params or {})
+        if cursor:
+            params["cursor"] = cursor
+        with get_run_metrics().phase("fetch_task_page"):
+            data = make_api_request("tm/tasks", token, params=params)
         if data and data.get("success") and "tasks" in data:
-            tasks_on_page = data["tasks"]
-            all_tasks_list.extend(tasks_on_page)
+            get_run_metrics().increment("weeek_task_pages_total")
+            get_run_metrics().increment("weeek_tasks_fetched_total", len(data["tasks"]))
+            yield data["tasks"]
             if data.get("hasMore") and data.get("cursor"):
                 cursor = data["cursor"]
             else:
-                break
+                return
         else:
-            logger.error(f"Ошибка при загрузке {page_num}-й страницы задач.")
-            break
+            raise TaskPaginationError(f"Ошибка при загрузке {page_num}-й страницы задач.")
+
+@timed_phase("fetch_all_tasks")
+def fetch_all_tasks(token: str) -> list["TaskRecord"]:
+    logger.info("Загрузка списка задач...")
+    all_tasks_list: list[TaskRecord] = []
+    try:
+        for tasks_on_page in iter_task_pages(token):
+            all_tasks_list.extend(decode_tasks(tasks_on_page))
+    except TaskPaginationError as e:
+        logger.error(f"{e} Неполный список задач отброшен.")
+        return []
     return all_tasks_list
 
+def prefetch_iterator(source: Iterable, depth: int = TASK_PAGE_PREFETCH_DEPTH) -> Iterator:
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    finished = object()
+    stop_event = threading.Event()
+
+    def produce() -> None:
+        try:
+            for item in source:
+                if stop_event.is_set():
+                    return
+                buffer.put((item, None))
+            buffer.put((finished, None))
+        except BaseException as e:
+            buffer.put((finished, e))
+
+    producer = threading.Thread(
+        target=contextvars.copy_context().run, args=(produce,), name="weeek-prefetch", daemon=True
+    )
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop_event.set()
+        while not buffer.empty():
+            buffer.get_nowait()
+
+def stream_task_rows(
+    token: str,
+    members_map: dict[str, str],
+    periods: Sequence[tuple[date, date]],
+    cache: MetadataCache | None = None,
+) -> Iterator[list[list[str | int | float]]]:
+    logger.info("Потоковая загрузка и обработка задач...")
+    board_cols_map: dict[tuple[int, int], str] = {}
+    known_board_ids: set[int] = set()
+    for tasks_on_page in prefetch_iterator(decode_tasks(page) for page in iter_task_pages(token)):
+        page_board_ids = {
+            normalize_board_id(task.board_id) for task in tasks_on_page if task.board_id is not None
+        }
+        new_board_ids = page_board_ids - known_board_ids - {None}
+        if new_board_ids:
+            board_cols_map.update(fetch_board_column_names(new_board_ids, token, cache=cache))
+            known_board_ids |= new_board_ids
+        yield process_tasks_to_sheet_rows(tasks_on_page, members_map, board_cols_map, *periods)
+        del tasks_on_page
+
+@timed_phase("sync_task_store")
+def sync_task_store(token: str, store: TaskStore, full_resync: bool = False) -> bool:
+    high_water_mark = store.get_high_water_mark()
+    last_full_sync = float(store.get_state("last_full_sync") or 0)
+    resync_interval = get_numeric_env_variable(FULL_RESYNC_INTERVAL_ENV_NAME, DEFAULT_FULL_RESYNC_INTERVAL_SECONDS, 0)
+    if not high_water_mark or time.time() - last_full_sync > resync_interval:
+        full_resync = True
+
+    sync_started_at = time.time()
+    synced_count = 0
+    if full_resync:
+        logger.info("Полная синхронизация задач с локальным хранилищем...")
+        extra_params = None
+    else:
+        logger.info(f"Инкрементальная синхронизация задач, измененных после {high_water_mark}...")
+        extra_params = {TASKS_UPDATED_SINCE_PARAM: high_water_mark}
+    if full_resync:
+        store.discard_staged_tasks()
+    try:
+        for tasks_on_page in iter_task_pages(token, extra_params):
+            if full_resync:
+                synced_count += store.stage_tasks(tasks_on_page)
+            else:
+                synced_count += store.upsert_tasks(tasks_on_page)
+    except TaskPaginationError as e:
+        if full_resync:
+            store.discard_staged_tasks()
+        logger.error(f"{e} Синхронизация прервана, используется предыдущий снимок задач.")
+        return False
+
+    if full_resync:
+        deleted_count = store.replace_with_staged_tasks()
+        store.set_state("last_full_sync", str(sync_started_at))
+        logger.info(f"Полная синхронизация завершена: {synced_count} задач, удалено {deleted_count}.")
+    else:
+        logger.info(f"Инкрементальная синхронизация завершена: обновлено {synced_count} задач.")
+    return True
+
+def fetch_task(token: str, task_id: str) -> dict | None:
+    if not TASK_ID_PATTERN.match(task_id):
+        logger.warning(f"Некорректный ID задачи: {task_id!r}. Пропуск.")
+        return None
+    data = make_api_request(f"tm/tasks/{task_id}", token)
+    if data and data.get("success") and data.get("task"):
+        return data["task"]
+    logger.warning(f"Не удалось загрузить задачу ID: {task_id}.")
+    return None
+
+@timed_phase("refresh_store_tasks")
+def refresh_store_tasks(token: str, store: TaskStore, task_ids: Iterable[str]) -> int:
+    refreshed_tasks = [task for task in (fetch_task(token, task_id) for task_id in task_ids) if task is not None]
+    if refreshed_tasks:
+        store.upsert_tasks(refreshed_tasks)
+    logger.info(f"Обновлено задач по запросу: {len(refreshed_tasks)}.")
+    return len(refreshed_tasks)
+
+def fetch_weeek_data_from_store(
+    token: str, store: TaskStore, cache: MetadataCache | None = None, full_resync: bool = False,
+    sync_tasks: bool = True
+) -> tuple[dict[str, str], Iterable["TaskRecord"] | None, dict[tuple[int, int], str]]:
+    logger.info("Начало загрузки данных из WEEEK API...")
+    members_map = fetch_workspace_members(token, cache)
+    if sync_tasks:
+        sync_task_store(token, store, full_resync)
+    if not store.count_tasks():
+        return members_map, None, {}
+    board_column_names_map = fetch_board_column_names(store.get_board_ids(), token, cache=cache)
+    logger.info("Загрузка данных из WEEEK API завершена.")
+    return members_map, store.iter_tasks(), board_column_names_map
+
 def format_value_for_sheet(value: any) -> str | int | float:
     if isinstance(value, date): return value.isoformat()
     if value is None: return ""
     return value
 
+def coerce_numeric_id(raw_id: object) -> object:
+    return int(raw_id) if isinstance(raw_id, str) and raw_id.isdigit() else raw_id
+
+def select_task_fields(task: dict) -> dict:
+    return {field: task[field] for field in TASK_REPORT_FIELDS if field in task}
+
+class TaskRecord:
+    __slots__ = (
+        "id", "title", "priority", "user_id", "board_id", "board_column_id",
+        "created_at", "end_date", "duration", "workloads",
+    )
+
+    def __init__(
+        self, id: object, title: object, priority: object, user_id: object, board_id: object,
+        board_column_id: object, created_at: date | None, end_date: date | None, duration: int | None,
+        workloads: tuple[tuple[int, int, str], ...]
+    ) -> None:
+        self.id = id
+        self.title = title
+        self.priority = priority
+        self.user_id = user_id
+        self.board_id = board_id
+        self.board_column_id = board_column_id
+        self.created_at = created_at
+        self.end_date = end_date
+        self.duration = duration
+        self.workloads = workloads
+
+def decode_workloads(raw_workloads: Iterable[dict] | None) -> tuple[tuple[int, int, str], ...]:
+    workloads = []
+    for workload in raw_workloads or ():
+        duration = workload.get("duration", 0) or 0
+        if duration <= 0:
+            continue
+        workload_day = parse_date_ordinal(workload.get("date"))
+        if workload_day is None:
+            continue
+        workloads.append((workload_day, duration, workload.get("comment", "") or ""))
+    return tuple(workloads)
+
+def decode_task(task: dict) -> TaskRecord:
+    return TaskRecord(
+        id=task.get("id", ""),
+        title=task.get("title", ""),
+        priority=task.get("priority"),
+        user_id=task.get("userId"),
+        board_id=coerce_numeric_id(task.get("boardId")),
+        board_column_id=coerce_numeric_id(task.get("boardColumnId")),
+        created_at=parse_date_string(task.get("createdAt")),
+        end_date=get_task_end_date(task),
+        duration=task.get("duration"),
+        workloads=decode_workloads(task.get("workloads")),
+    )
+
+def decode_tasks(tasks: Iterable[dict | TaskRecord]) -> list[TaskRecord]:
+    return [task if isinstance(task, TaskRecord) else decode_task(task) for task in tasks]
+
+class PeriodIndex:
+    __slots__ = ("periods", "boundaries", "segment_periods")
+
+    def __init__(self, periods: Sequence[tuple[date, date]]) -> None:
+        self.periods = list(periods)
+        self.boundaries = sorted(
+            {start.toordinal() for start, _ in self.periods} | {end.toordinal() + 1 for _, end in self.periods}
+        )
+        self.segment_periods: list[tuple[int, ...]] = [
+            tuple(
+                period_num for period_num, (start, end) in enumerate(self.periods)
+                if start.toordinal() <= segment_start <= end.toordinal()
+            )
+            for segment_start in self.boundaries[:-1]
+        ]
+
+    def lookup(self, day: int) -> tuple[int, ...]:
+        segment_num = bisect.bisect_right(self.boundaries, day) - 1
+        if 0 <= segment_num < len(self.segment_periods):
+            return self.segment_periods[segment_num]
+        return ()
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+def bucket_workloads(
+    tasks: Sequence[TaskRecord], period_index: PeriodIndex
+) -> tuple[list[list[int]], list[dict[int, list[str]]]]:
+    period_minutes = [[0] * len(tasks) for _ in period_index.periods]
+    period_comments: list[dict[int, list[str]]] = [{} for _ in period_index.periods]
+    lookup = period_index.lookup
+    for task_num, task in enumerate(tasks):
+        for workload_day, minutes, comment in task.workloads:
+            for period_num in lookup(workload_day):
+                period_minutes[period_num][task_num] += minutes
+                if comment:
+                    period_comments[period_num].setdefault(task_num, []).append(comment)
+    return period_minutes, period_comments
+
+def get_task_end_date(task: dict) -> date | None:
+    if not task.get("isCompleted"):
+        return None
+    time_entries = task.get("timeEntries", []) or task.get("workloads", [])
+    entry_days = [
+        entry_day for entry_day in (parse_date_ordinal(entry.get("date")) for entry in time_entries if entry.get("date"))
+        if entry_day is not None
+    ]
+    if entry_days:
+        return date.fromordinal(max(entry_days))
+    if task.get("updatedAt"):
+        return parse_date_string(task.get("updatedAt"))
+    return None
+
+def get_task_status(task: TaskRecord, board_cols_map: dict[tuple[int, int], str]) -> str:
+    task_board_id, task_col_id = task.board_id, task.board_column_id
+    if isinstance(task_board_id, int) and isinstance(task_col_id, int):
+        return board_cols_map.get((task_board_id, task_col_id), str(task_col_id))
+    if task_col_id is not None:
+        return str(task_col_id)
+    return ""
+
+def format_numbered_comments(comments: list[str] | None) -> str:
+    if not comments:
+        return ""
+    return "\n".join(f"{i+1}. {c}" for i, c in enumerate(comments))
+
+def minutes_to_hours(minutes: int | None) -> int | None:
+    return math.ceil(minutes / 60) if minutes and minutes > 0 else None
+
+def build_report_headers(*periods: tuple[date, date]) -> list[str]:
+    report_headers = [
+        "Задача (Номер)", "Приоритет", "Исполнитель", "Статус",
+        "Дата начала", "Дата окончания", "Оценка времени",
+    ]
+    for period_start, period_end in periods:
+        report_headers += [f"Затрекано ({period_start:%d.%m} - {period_end:%d.%m})", "Комментарии"]
+    return report_headers + ["Стоимость в час", "Расчет зп"]
+
+@timed_phase("process_tasks_to_sheet_rows")
 def process_tasks_to_sheet_rows(
-    tasks_data: list[dict],
+    tasks_data: Iterable[TaskRecord | dict],
     members_map: dict[str, str],
     board_cols_map: dict[tuple[int, int], str],
-    period1_dates: tuple[date, date],
-    period2_dates: tuple[date, date]
+    *periods: tuple[date, date]
 ) -> list[list[str | int | float]]:
+    period_index = PeriodIndex(periods)
     sheet_rows: list[list[str | int | float]] = []
-    p1_start, p1_end = period1_dates
-    p2_start, p2_end = period2_dates
+    for tasks in iter_batches(tasks_data, TASK_BATCH_SIZE):
+        tasks = decode_tasks(tasks)
+        sheet_rows.extend(build_task_batch_rows(tasks, members_map, board_cols_map, period_index))
+    get_run_metrics().increment("report_rows_built_total", len(sheet_rows))
+    return sheet_rows
+
+def split_rows_by_period(
+    sheet_rows: Sequence[list[str | int | float]], period_count: int
+) -> list[list[list[str | int | float]]]:
+    tracked_col_start = len(build_report_headers()) - 2
+    period_rows: list[list[list[str | int | float]]] = [[] for _ in range(period_count)]
+    for row in sheet_rows:
+        task_cells, salary_cells = row[:tracked_col_start], row[-2:]
+        for period_num in range(period_count):
+            tracked_col = tracked_col_start + 2 * period_num
+            if row[tracked_col] != "":
+                period_rows[period_num].append(task_cells + row[tracked_col:tracked_col + 2] + salary_cells)
+    return period_rows
 
-    for task in tasks_data:
-        priority_val = task.get("priority")
+def build_task_batch_rows(
+    tasks: Sequence[TaskRecord],
+    members_map: dict[str, str],
+    board_cols_map: dict[tuple[int, int], str],
+    period_index: PeriodIndex
+) -> list[list[str | int | float]]:
+    period_minutes, period_comments = bucket_workloads(tasks, period_index)
+    sheet_rows: list[list[str | int | float]] = []
+    for task_num, task in enumerate(tasks):
+        priority_val = task.priority
         priority_str = PRIORITY_MAP.get(priority_val, str(priority_val)) if priority_val is not None else ""
 
-        user_id = task.get("userId")
+        user_id = task.user_id
         executor = members_map.get(user_id, user_id if user_id else "")
 
-        task_board_id_raw = task.get("boardId")
-        task_col_id_raw = task.get("boardColumnId")
-        status = ""
-        task_board_id = int(task_board_id_raw) if isinstance(task_board_id_raw, str) and task_board_id_raw.isdigit() else task_board_id_raw
-        task_col_id = int(task_col_id_raw) if isinstance(task_col_id_raw, str) and task_col_id_raw.isdigit() else task_col_id_raw
-
-        if isinstance(task_board_id, int) and isinstance(task_col_id, int):
-             status = board_cols_map.get((task_board_id, task_col_id), str(task_col_id))
-        elif isinstance(task_col_id, int) :
-            status = str(task_col_id)
-        elif task_col_id is not None: 
-            status = str(task_col_id)
-
-
-        created_at = parse_date_string(task.get("createdAt"))
-        date_ended = None
-        if task.get("isCompleted"):
-            time_entries = task.get("timeEntries", []) or task.get("workloads", [])
-            valid_entries = [entry for entry in time_entries if entry.get("date")]
-            if valid_entries:
-                latest_entry = sorted(valid_entries, key=lambda x: date_parser.parse(x["date"]).date(), reverse=True)[0]
-                date_ended = parse_date_string(latest_entry["date"])
-            elif task.get("updatedAt"):
-                date_ended = parse_date_string(task.get("updatedAt"))
-
-        est_minutes = task.get("duration")
-        est_hours = math.ceil(est_minutes / 60) if est_minutes and est_minutes > 0 else None
-
-        time_p1_min, time_p2_min = 0, 0
-        comments_p1, comments_p2 = [], []
-        for workload in task.get("workloads", []):
-            workload_date = parse_date_string(workload.get("date"))
-            duration = workload.get("duration", 0) or 0
-            comment = workload.get("comment", "")
-            if workload_date and duration > 0:
-                if p1_start <= workload_date <= p1_end:
-                    time_p1_min += duration
-                    if comment: comments_p1.append(comment)
-                if p2_start <= workload_date <= p2_end:
-                    time_p2_min += duration
-                    if comment: comments_p2.append(comment)
-        
-        comments_p1_str = "\n".join(f"{i+1}. {c}" for i, c in enumerate(comments_p1) if c)
-        comments_p2_str = "\n".join(f"{i+1}. {c}" for i, c in enumerate(comments_p2) if c)
-        time_p1_hours = math.ceil(time_p1_min / 60) if time_p1_min > 0 else None
-        time_p2_hours = math.ceil(time_p2_min / 60) if time_p2_min > 0 else None
-
         row = [
-            f"{task.get('title', '')} ({task.get('id', '')})",
-            priority_str, executor, status,
-            created_at, date_ended,
-            est_hours, time_p1_hours, comments_p1_str,
-            time_p2_hours, comments_p2_str,
-            None, None
+            f"{task.title} ({task.id})",
+            priority_str, executor, get_task_status(task, board_cols_map),
+            task.created_at, task.end_date,
+            minutes_to_hours(task.duration),
         ]
+        for period_num in range(len(period_index.periods)):
+            row.append(minutes_to_hours(period_minutes[period_num][task_num]))
+            row.append(format_numbered_comments(period_comments[period_num].get(task_num)))
+        row += [None, None]
         sheet_rows.append([format_value_for_sheet(val) for val in row])
         
     return sheet_rows
 
-def get_gspread_client(credentials_file: str) -> gspread.Client | None:
+@timed_phase("get_gspread_client")
+def get_gspread_client(credentials_file: str) -> "gspread.Client | None":
     logger.info(f"Авторизация в Google Sheets API...")
+    import gspread
+    from google.oauth2.service_account import Credentials
     try:
         creds = Credentials.from_service_account_file(
             credentials_file,
@@ -258,129 +1120,444 @@ def get_gspread_client(credentials_file: str) -> gspread.Client | None:
         logger.error(f"Ошибка авторизации в Google Sheets API: {e}")
     return None
 
+def build_repeat_cell_request(
+    sheet_gid: int, start_row: int, end_row: int, start_col: int, end_col: int,
+    cell_format: dict, fields: str
+) -> dict:
+    return {
+        "repeatCell": {
+            "range": {"sheetId": sheet_gid, "startRowIndex": start_row, "endRowIndex": end_row,
+                      "startColumnIndex": start_col, "endColumnIndex": end_col},
+            "cell": {"userEnteredFormat": cell_format},
+            "fields": fields}}
+
+def iter_value_runs(values: Sequence) -> Iterator[tuple[int, int, object]]:
+    run_start = 0
+    for index in range(1, len(values) + 1):
+        if index == len(values) or values[index] != values[run_start]:
+            yield run_start, index, values[run_start]
+            run_start = index
+
+def iter_index_runs(sorted_indices: Sequence[int]) -> Iterator[tuple[int, int, None]]:
+    run_start = 0
+    for position in range(1, len(sorted_indices) + 1):
+        if position == len(sorted_indices) or sorted_indices[position] != sorted_indices[position - 1] + 1:
+            yield sorted_indices[run_start], sorted_indices[position - 1] + 1, None
+            run_start = position
+
+def get_column_alignment(header_name: str) -> str:
+    return "LEFT" if header_name == "Задача (Номер)" or header_name.startswith("Комментарии") else "CENTER"
+
+def is_priority_conditional_format(rule: dict, sheet_gid: int, priority_col_index: int) -> bool:
+    condition = rule.get("booleanRule", {}).get("condition", {})
+    condition_values = condition.get("values") or [{}]
+    ranges = rule.get("ranges") or []
+    return (
+        condition.get("type") == "TEXT_EQ"
+        and condition_values[0].get("userEnteredValue") in PRIORITY_COLORS_GSHEETS
+        and bool(ranges)
+        and all(
+            grid_range.get("sheetId", 0) == sheet_gid
+            and grid_range.get("startColumnIndex") == priority_col_index
+            and grid_range.get("endColumnIndex") == priority_col_index + 1
+            for grid_range in ranges
+        )
+    )
+
+def plan_priority_conditional_formats(
+    sheet_gid: int, priority_col_index: int, existing_rules: Sequence[dict] = ()
+) -> list[dict]:
+    format_requests = [
+        {"deleteConditionalFormatRule": {"sheetId": sheet_gid, "index": rule_index}}
+        for rule_index in reversed(range(len(existing_rules)))
+        if is_priority_conditional_format(existing_rules[rule_index], sheet_gid, priority_col_index)
+    ]
+    for rule_index, (priority_text, bg_color) in enumerate(PRIORITY_COLORS_GSHEETS.items()):
+        format_requests.append({
+            "addConditionalFormatRule": {
+                "index": rule_index,
+                "rule": {
+                    "ranges": [{"sheetId": sheet_gid, "startRowIndex": 1,
+                                "startColumnIndex": priority_col_index, "endColumnIndex": priority_col_index + 1}],
+                    "booleanRule": {
+                        "condition": {"type": "TEXT_EQ", "values": [{"userEnteredValue": priority_text}]},
+                        "format": {"backgroundColor": bg_color}}}}})
+    return format_requests
+
+def plan_sheet_formatting(
+    sheet_gid: int,
+    headers_list: list[str],
+    data_rows: Sequence[list],
+    salary_col_index: int | None = None,
+    first_row_index: int = 1,
+    include_header: bool = True,
+    existing_conditional_formats: Sequence[dict] | None = None
+) -> list[dict]:
+    format_requests = []
+    column_count = len(headers_list)
+    if include_header:
+        format_requests.append(build_repeat_cell_request(
+            sheet_gid, 0, 1, 0, column_count,
+            {"textFormat": {"bold": True, "fontFamily": "Times New Roman", "fontSize": 12},
+             "horizontalAlignment": "CENTER", "verticalAlignment": "MIDDLE"},
+            "userEnteredFormat(textFormat,horizontalAlignment,verticalAlignment)"))
+
+    if data_rows:
+        start_row, end_row = first_row_index, first_row_index + len(data_rows)
+        format_requests.append(build_repeat_cell_request(
+            sheet_gid, start_row, end_row, 0, column_count,
+            {"textFormat": {"fontFamily": "Times New Roman", "fontSize": 12},
+             "verticalAlignment": "MIDDLE", "wrapStrategy": "WRAP"},
+            "userEnteredFormat(textFormat,verticalAlignment,wrapStrategy)"))
+
+        alignments = [get_column_alignment(header_name) for header_name in headers_list]
+        for run_start, run_end, horz_align in iter_value_runs(alignments):
+            format_requests.append(build_repeat_cell_request(
+                sheet_gid, start_row, end_row, run_start, run_end,
+                {"horizontalAlignment": horz_align}, "userEnteredFormat.horizontalAlignment"))
+
+        for col_index_based, header_name in enumerate(headers_list):
+            if col_index_based == salary_col_index:
+                format_requests.append(build_repeat_cell_request(
+                    sheet_gid, start_row, end_row, col_index_based, col_index_based + 1,
+                    {"numberFormat": {"type": "NUMBER", "pattern": "0.00"}}, "userEnteredFormat.numberFormat"))
+            elif header_name.startswith(SHEET_NUMERIC_HEADER_PREFIXES):
+                format_requests.append(build_repeat_cell_request(
+                    sheet_gid, start_row, end_row, col_index_based, col_index_based + 1,
+                    {"numberFormat": {"type": "NUMBER", "pattern": "0"}}, "userEnteredFormat.numberFormat"))
+
+        if "Приоритет" in headers_list and existing_conditional_formats is not None:
+            priority_col_index = headers_list.index("Приоритет")
+            format_requests.append(build_repeat_cell_request(
+                sheet_gid, start_row, end_row, priority_col_index, priority_col_index + 1,
+                {}, "userEnteredFormat.backgroundColor"))
+            format_requests += plan_priority_conditional_formats(
+                sheet_gid, priority_col_index, existing_conditional_formats
+            )
+
+    if headers_list:
+        format_requests.append({
+            "autoResizeDimensions": {
+                "dimensions": {"sheetId": sheet_gid, "dimension": "COLUMNS",
+                               "startIndex": 0, "endIndex": column_count}}})
+    return format_requests
+
+def column_letter(col_index: int) -> str:
+    letters = ""
+    col_num = col_index + 1
+    while col_num:
+        col_num, remainder = divmod(col_num - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+def get_salary_formula_columns(headers_list: list[str]) -> tuple[int | None, tuple[list[str], str] | None]:
+    header_map = {name: index for index, name in enumerate(headers_list)}
+    tracked_time_indices = [index for index, name in enumerate(headers_list) if name.startswith("Затрекано (")]
+    if not tracked_time_indices or "Стоимость в час" not in header_map or "Расчет зп" not in header_map:
+        return None, None
+    tracked_letters = [column_letter(col_index) for col_index in tracked_time_indices]
+    return header_map["Расчет зп"], (tracked_letters, column_letter(header_map["Стоимость в час"]))
+
+def build_salary_formula(row_num_based: int, tracked_letters: list[str], rate_letter: str) -> str:
+    tracked_sum = " + ".join(f"N({letter}{row_num_based})" for letter in tracked_letters)
+    return f"=({tracked_sum}) * N({rate_letter}{row_num_based})"
+
+def with_salary_formulas(
+    data_rows: Sequence[list],
+    salary_col_index: int | None,
+    salary_formula_columns: tuple[list[str], str] | None,
+    first_row_num: int = 2
+) -> list[list]:
+    if salary_col_index is None or salary_formula_columns is None:
+        return list(data_rows)
+    tracked_letters, rate_letter = salary_formula_columns
+    rows_with_formulas = []
+    for row_num_based, row_data in enumerate(data_rows, start=first_row_num):
+        row_copy = list(row_data)
+        row_copy[salary_col_index] = build_salary_formula(row_num_based, tracked_letters, rate_letter)
+        rows_with_formulas.append(row_copy)
+    return rows_with_formulas
+
+class SlidingWindowQuota:
+    def __init__(self, limit: int, window_seconds: float) -> None:
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._calls: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= self.window_seconds:
+                    self._calls.popleft()
+                if len(self._calls) < self.limit:
+                    self._calls.append(now)
+                    return
+                wait_seconds = self.window_seconds - (now - self._calls[0])
+            logger.info(f"Достигнута квота записи Google Sheets, ожидание {wait_seconds:.1f} с...")
+            time.sleep(wait_seconds)
+
+_sheets_write_quota: SlidingWindowQuota | None = None
+_sheets_write_quota_lock = threading.Lock()
+
+def get_sheets_write_quota() -> SlidingWindowQuota:
+    global _sheets_write_quota
+    with _sheets_write_quota_lock:
+        if _sheets_write_quota is None:
+            _sheets_write_quota = SlidingWindowQuota(
+                get_numeric_env_variable(SHEETS_WRITE_QUOTA_ENV_NAME, DEFAULT_SHEETS_WRITE_QUOTA_PER_MINUTE, 1),
+                SHEETS_QUOTA_WINDOW_SECONDS
+            )
+        return _sheets_write_quota
+
+def call_sheets_api(api_call: Callable, *args, is_write: bool = True, idempotent: bool = True, **kwargs) -> object:
+    import gspread
+    metrics = get_run_metrics()
+    method_name = getattr(api_call, "__name__", "unknown")
+    retryable_status_codes = API_RETRYABLE_STATUS_CODES if idempotent else API_THROTTLED_STATUS_CODES
+    for attempt in range(SHEETS_MAX_RETRIES + 1):
+        if attempt:
+            metrics.increment("sheets_api_retries_total", method=method_name)
+        if is_write:
+            with metrics.phase("sheets_write_quota_wait"):
+                get_sheets_write_quota().acquire()
+        metrics.increment("sheets_api_calls_total", method=method_name)
+        try:
+            return api_call(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            response = getattr(e, "response", None)
+            status_code = getattr(response, "status_code", None)
+            if status_code not in retryable_status_codes or attempt == SHEETS_MAX_RETRIES:
+                raise
+            server_delay = parse_retry_after(response) if response is not None else None
+            retry_delay = server_delay if server_delay is not None else compute_backoff_delay(attempt)
+            logger.warning(f"Google Sheets API вернул {status_code} (попытка {attempt + 1}/{SHEETS_MAX_RETRIES + 1}), повтор через {retry_delay:.1f} с.")
+            time.sleep(retry_delay)
+
+def record_sheets_values_payload(values: object) -> None:
+    get_run_metrics().increment(
+        "sheets_values_payload_bytes_total", len(json.dumps(values, ensure_ascii=False, default=str).encode("utf-8"))
+    )
+
+def chunk_batch_requests(
+    requests_list: Sequence[dict],
+    max_requests: int = SHEETS_BATCH_MAX_REQUESTS,
+    max_bytes: int = SHEETS_BATCH_MAX_BYTES
+) -> Iterator[list[dict]]:
+    chunk: list[dict] = []
+    chunk_bytes = 0
+    for request in requests_list:
+        request_bytes = len(json.dumps(request, ensure_ascii=False).encode("utf-8"))
+        if chunk and (len(chunk) >= max_requests or chunk_bytes + request_bytes > max_bytes):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(request)
+        chunk_bytes += request_bytes
+    if chunk:
+        yield chunk
+
+def execute_batch_update(
+    spreadsheet: "gspread.Spreadsheet", requests_list: Sequence[dict], stop_on_error: bool = False
+) -> bool:
+    import gspread
+    chunks = list(chunk_batch_requests(requests_list))
+    succeeded = True
+    metrics = get_run_metrics()
+    for chunk_num, chunk in enumerate(chunks, start=1):
+        metrics.increment("sheets_batch_requests_total", len(chunk))
+        metrics.increment("sheets_batch_payload_bytes_total", len(json.dumps(chunk, ensure_ascii=False).encode("utf-8")))
+        try:
+            call_sheets_api(
+                spreadsheet.batch_update, {"requests": chunk},
+                idempotent=all(next(iter(request)) in SHEETS_IDEMPOTENT_REQUEST_KINDS for request in chunk)
+            )
+        except gspread.exceptions.APIError as e_api:
+            err_details = e_api.response.json() if hasattr(e_api, 'response') and hasattr(e_api.response, 'json') else str(e_api)
+            logger.error(f"Ошибка API Google Sheets при пакетном обновлении (часть {chunk_num}/{len(chunks)}): {err_details}")
+            succeeded = False
+            if stop_on_error:
+                break
+    return succeeded
+
+def get_sheet_conditional_formats(spreadsheet: "gspread.Spreadsheet", sheet_gid: int) -> list[dict]:
+    metadata = call_sheets_api(
+        spreadsheet.fetch_sheet_metadata, is_write=False,params={"fields": "sheets(properties.sheetId,conditionalFormats)"})
+    for sheet in metadata.get("sheets", []):
+        if sheet.get("properties", {}).get("sheetId") == sheet_gid:
+            return sheet.get("conditionalFormats", [])
+    return []
+
+def extract_sheet_task_id(task_cell: object) -> str | None:
+    match = SHEET_TASK_ID_PATTERN.search(str(task_cell))
+    return match.group(1) if match and match.group(1) else None
+
+def normalize_cell_for_diff(value: object) -> object:
+    if value is None or value == "":
+        return ""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value)
+    if SHEET_DATE_PATTERN.match(text):
+        try:
+            return float((date.fromisoformat(text) - SHEET_SERIAL_EPOCH).days)
+        except ValueError:
+            return text
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+def sync_changed_sheet_rows(
+    spreadsheet: "gspread.Spreadsheet",
+    worksheet: "gspread.Worksheet",
+    headers_list: list[str],
+    data_to_write: list[list[str | int | float]]
+) -> bool:
+    import gspread
+    existing_values = call_sheets_api(
+        worksheet.get_all_values, is_write=False,
+        value_render_option=gspread.utils.ValueRenderOption.unformatted,
+        date_time_render_option=gspread.utils.DateTimeOption.serial_number,
+    )
+    if not existing_values or [str(cell) for cell in existing_values[0][:len(headers_list)]] != headers_list:
+        logger.info("Заголовки листа не совпадают с отчетом, выполняется полная перезапись.")
+        return False
+
+    compared_columns = [index for index, name in enumerate(headers_list) if name not in SHEET_PRESERVED_HEADERS]
+    column_is_written = [name not in SHEET_PRESERVED_HEADERS for name in headers_list]
+
+    def row_signature(row: Sequence) -> tuple:
+        return tuple(normalize_cell_for_diff(row[index] if index < len(row) else "") for index in compared_columns)
+
+    existing_rows_by_id: dict[str, tuple[int, tuple]] = {}
+    deleted_row_indices: list[int] = []
+    for row_index, row_data in enumerate(existing_values[1:], start=1):
+        task_id = extract_sheet_task_id(row_data[0]) if row_data else None
+        if task_id is None or task_id in existing_rows_by_id:
+            if any(cell != "" for cell in row_data):
+                deleted_row_indices.append(row_index)
+            continue
+        existing_rows_by_id[task_id] = (row_index, row_signature(row_data))
+
+    new_task_ids: set[str] = set()
+    changed_row_count = 0
+    changed_ranges: list[dict] = []
+    inserted_rows: list[list[str | int | float]] = []
+    for row_data in data_to_write:
+        task_id = extract_sheet_task_id(row_data[0])
+        if task_id is None or task_id in new_task_ids:
+            continue
+        new_task_ids.add(task_id)
+        existing_row = existing_rows_by_id.get(task_id)
+        if existing_row is None:
+            inserted_rows.append(row_data)
+            continue
+        row_index, existing_signature = existing_row
+        if existing_signature != row_signature(row_data):
+            changed_row_count += 1
+            for run_start, run_end, is_written in iter_value_runs(column_is_written):
+                if is_written:
+                    changed_ranges.append({
+                        "range": f"{column_letter(run_start)}{row_index + 1}:{column_letter(run_end - 1)}{row_index + 1}",
+                        "values": [list(row_data[run_start:run_end])]})
+    deleted_row_indices += [
+        row_index for task_id, (row_index, _) in existing_rows_by_id.items() if task_id not in new_task_ids
+    ]
+    logger.info(
+        f"Разница с листом: изменено {changed_row_count}, "
+        f"добавлено {len(inserted_rows)}, удалено {len(deleted_row_indices)} строк."
+    )
+
+    if changed_ranges:
+        record_sheets_values_payload(changed_ranges)
+        call_sheets_api(worksheet.batch_update, changed_ranges, value_input_option='USER_ENTERED')
+
+    structure_requests: list[dict] = []
+    for run_start, run_end, _ in reversed(list(iter_index_runs(sorted(deleted_row_indices)))):
+        structure_requests.append({
+            "deleteDimension": {"range": {"sheetId": worksheet.id, "dimension": "ROWS",
+                                          "startIndex": run_start, "endIndex": run_end}}})
+
+    remaining_row_count = len(existing_values) - len(deleted_row_indices)
+    if inserted_rows:
+        required_row_count = remaining_row_count + len(inserted_rows)
+        available_row_count = worksheet.row_count - len(deleted_row_indices)
+        if required_row_count > available_row_count:
+            structure_requests.append({
+                "appendDimension": {"sheetId": worksheet.id, "dimension": "ROWS",
+                                    "length": required_row_count - available_row_count}})
+        salary_col_index, salary_formula_columns = get_salary_formula_columns(headers_list)
+        structure_requests += plan_sheet_formatting(
+            worksheet.id, headers_list, inserted_rows, salary_col_index=salary_col_index,
+            first_row_index=remaining_row_count, include_header=False
+        )
+
+    if structure_requests and not execute_batch_update(spreadsheet, structure_requests, stop_on_error=True):
+        raise RuntimeError("Не удалось применить структурные изменения листа.")
+    if inserted_rows:
+        first_row_num = remaining_row_count + 1
+        inserted_values = with_salary_formulas(
+            inserted_rows, salary_col_index, salary_formula_columns, first_row_num=first_row_num
+        )
+        record_sheets_values_payload(inserted_values)
+        call_sheets_api(
+            worksheet.update,
+            inserted_values,
+            range_name=f"A{first_row_num}",
+            value_input_option='USER_ENTERED'
+        )
+    return True
+
+@timed_phase("update_google_sheet")
 def update_google_sheet(
-    client: gspread.Client,
+    client: "gspread.Client",
     sheet_id: str,
     sheet_name_target: str,
     headers_list: list[str],
-    data_to_write: list[list[str | int | float]]
-) -> None:
+    data_to_write: list[list[str | int | float]],
+    diff_write: bool = False
+) -> bool:
+    import gspread
+    get_run_metrics().set_gauge("sheet_rows", len(data_to_write), sheet=sheet_name_target)
     try:
-        spreadsheet = client.open_by_key(sheet_id)
+        spreadsheet = call_sheets_api(client.open_by_key, sheet_id, is_write=False)
         try:
-            worksheet = spreadsheet.worksheet(sheet_name_target)
-            worksheet.clear()
+            worksheet = call_sheets_api(spreadsheet.worksheet, sheet_name_target, is_write=False)
+            if diff_write and sync_changed_sheet_rows(spreadsheet, worksheet, headers_list, data_to_write):
+                logger.info(f"Изменения успешно записаны в Google Таблицу.")
+                return True
+            call_sheets_api(worksheet.clear)
         except gspread.exceptions.WorksheetNotFound:
             logger.info(f"Лист '{sheet_name_target}' не найден, создается новый...")
-            worksheet = spreadsheet.add_worksheet(
+            worksheet = call_sheets_api(
+                spreadsheet.add_worksheet, idempotent=False,
                 title=sheet_name_target,
                 rows=str(max(100, len(data_to_write) + 1)),
                 cols=str(max(20, len(headers_list)))
             )
 
-        all_sheet_data = [headers_list] + data_to_write
-        worksheet.update(all_sheet_data, value_input_option='USER_ENTERED')
-
-        format_requests_batch = []
-        sheet_id_gid = worksheet.id
+        salary_col_index, salary_formula_columns = get_salary_formula_columns(headers_list)
+        all_sheet_data = [headers_list] + with_salary_formulas(data_to_write, salary_col_index, salary_formula_columns)
+        record_sheets_values_payload(all_sheet_data)
+        call_sheets_api(worksheet.update, all_sheet_data, value_input_option='USER_ENTERED')
 
-        format_requests_batch.append({
-            "repeatCell": {
-                "range": {"sheetId": sheet_id_gid, "startRowIndex": 0, "endRowIndex": 1,
-                          "startColumnIndex": 0, "endColumnIndex": len(headers_list)},
-                "cell": {"userEnteredFormat": {
-                    "textFormat": {"bold": True, "fontFamily": "Times New Roman", "fontSize": 12},
-                    "horizontalAlignment": "CENTER", "verticalAlignment": "MIDDLE"}},
-                "fields": "userEnteredFormat(textFormat,horizontalAlignment,verticalAlignment)"}})
-        
-        header_map = {name: index for index, name in enumerate(headers_list)}
-        priority_col_index = header_map.get("Приоритет")
-        
-        tracked_time_headers = [h for h in headers_list if h.startswith("Затрекано (")]
-        col_h_index = col_j_index = col_l_index = salary_col_index = None
-        
-        if len(tracked_time_headers) >= 1 and tracked_time_headers[0] in header_map:
-            col_h_index = header_map[tracked_time_headers[0]]
-        if len(tracked_time_headers) >= 2 and tracked_time_headers[1] in header_map:
-            col_j_index = header_map[tracked_time_headers[1]]
-        if "Стоимость в час" in header_map: col_l_index = header_map["Стоимость в час"]
-        if "Расчет зп" in header_map: salary_col_index = header_map["Расчет зп"]
-
-        for row_num_based, row_data in enumerate(data_to_write, start=2):
-            row_index_based = row_num_based - 1
-
-            if salary_col_index is not None and col_h_index is not None and \
-               col_j_index is not None and col_l_index is not None:
-                h_letter = gspread.utils.rowcol_to_a1(1, col_h_index + 1)[:-1] 
-                j_letter = gspread.utils.rowcol_to_a1(1, col_j_index + 1)[:-1]
-                l_letter = gspread.utils.rowcol_to_a1(1, col_l_index + 1)[:-1]
-                
-                formula = f"=(N({h_letter}{row_num_based}) + N({j_letter}{row_num_based})) * N({l_letter}{row_num_based})"
-                worksheet.update_acell(gspread.utils.rowcol_to_a1(row_num_based, salary_col_index + 1), f"={formula}")
-                
-                format_requests_batch.append({
-                    "repeatCell": {
-                        "range": {"sheetId": sheet_id_gid, "startRowIndex": row_index_based, "endRowIndex": row_index_based + 1,
-                                  "startColumnIndex": salary_col_index, "endColumnIndex": salary_col_index + 1},
-                        "cell": {"userEnteredFormat": {"numberFormat": {"type": "NUMBER", "pattern": "0.00"}}},
-                        "fields": "userEnteredFormat.numberFormat"}})
-            
-            if priority_col_index is not None and priority_col_index < len(row_data):
-                priority_text = str(row_data[priority_col_index])
-                bg_color = PRIORITY_COLORS_GSHEETS.get(priority_text)
-                if bg_color:
-                    format_requests_batch.append({
-                        "repeatCell": {
-                            "range": {"sheetId": sheet_id_gid, "startRowIndex": row_index_based, "endRowIndex": row_index_based + 1,
-                                      "startColumnIndex": priority_col_index, "endColumnIndex": priority_col_index + 1},
-                            "cell": {"userEnteredFormat": {"backgroundColor": bg_color}},
-                            "fields": "userEnteredFormat.backgroundColor"}})
-            
-            format_requests_batch.append({
-                "repeatCell": {
-                    "range": {"sheetId": sheet_id_gid, "startRowIndex": row_index_based, "endRowIndex": row_index_based + 1,
-                              "startColumnIndex": 0, "endColumnIndex": len(headers_list)},
-                    "cell": {"userEnteredFormat": {
-                        "textFormat": {"fontFamily": "Times New Roman", "fontSize": 12},
-                        "verticalAlignment": "MIDDLE", "wrapStrategy": "WRAP"}},
-                    "fields": "userEnteredFormat(textFormat,verticalAlignment,wrapStrategy)"}})
-
-            for col_index_based, header_name in enumerate(headers_list):
-                horz_align = "LEFT" if header_name == "Задача (Номер)" or header_name.startswith("Комментарии") else "CENTER"
-                format_requests_batch.append({
-                    "repeatCell": {
-                        "range": {"sheetId": sheet_id_gid, "startRowIndex": row_index_based, "endRowIndex": row_index_based + 1,
-                                  "startColumnIndex": col_index_based, "endColumnIndex": col_index_based + 1},
-                        "cell": {"userEnteredFormat": {"horizontalAlignment": horz_align}},
-                        "fields": "userEnteredFormat.horizontalAlignment"}})
-                
-                cell_value = row_data[col_index_based]
-                if (header_name == "Оценка времени" or header_name.startswith("Затрекано (")) and \
-                   (salary_col_index is None or col_index_based != salary_col_index): 
-                    if isinstance(cell_value, (int, float)): 
-                        format_requests_batch.append({
-                            "repeatCell": {
-                                "range": {"sheetId": sheet_id_gid, "startRowIndex": row_index_based, "endRowIndex": row_index_based + 1,
-                                          "startColumnIndex": col_index_based, "endColumnIndex": col_index_based + 1},
-                                "cell": {"userEnteredFormat": {"numberFormat": {"type": "NUMBER", "pattern": "0"}}},
-                                "fields": "userEnteredFormat.numberFormat"}})
-        
-        if headers_list:
-            format_requests_batch.append({
-                "autoResizeDimensions": {
-                    "dimensions": {"sheetId": sheet_id_gid, "dimension": "COLUMNS",
-                                   "startIndex": 0, "endIndex": len(headers_list)}}})
+        format_requests_batch = plan_sheet_formatting(
+            worksheet.id, headers_list, data_to_write,
+            salary_col_index=salary_col_index,
+            existing_conditional_formats=get_sheet_conditional_formats(spreadsheet, worksheet.id)
+        )
 
         if format_requests_batch:
             try:
-                spreadsheet.batch_update({"requests": format_requests_batch})
-            except gspread.exceptions.APIError as e_api:
-                err_details = e_api.response.json() if hasattr(e_api, 'response') and hasattr(e_api.response, 'json') else str(e_api)
-                logger.error(f"Ошибка API Google Sheets при пакетном обновлении: {err_details}")
+                execute_batch_update(spreadsheet, format_requests_batch)
             except Exception as e_gen:
                 logger.error(f"Непредвиденная ошибка при пакетном обновлении: {e_gen}")
 
         logger.info(f"Данные успешно записаны и отформатированы в Google Таблице.")
+        return True
 
     except gspread.exceptions.SpreadsheetNotFound:
         logger.error(f"Google Таблица не найдена. Проверьте ID и права доступа сервисного аккаунта.")
@@ -389,50 +1566,827 @@ def update_google_sheet(
         logger.error(f"Общая ошибка Google Sheets API: {err_details}")
     except Exception as e:
         logger.error(f"Непредвиденная ошибка при работе с Google Таблицей: {e}", exc_info=True)
+    return False
 
-def main() -> None:
-    logger.info("Запуск скрипта генерации отчета WEEEK.")
+def get_export_field_names(headers_list: list[str]) -> list[str]:
+    field_names: list[str] = []
+    for name, previous_name in zip(headers_list, ["", *headers_list]):
+        if name == "Комментарии" and previous_name.startswith("Затрекано ("):
+            name = f"{name} {previous_name.removeprefix('Затрекано ')}"
+        field_names.append(name)
+    return field_names
+
+class ReportFileSink(abc.ABC):
+    file_extension = ""
+
+    def __init__(self, file_path: str, headers_list: list[str]) -> None:
+        self.file_path = file_path
+        self.tmp_path = f"{file_path}.tmp"
+        self.field_names = get_export_field_names(headers_list)
+        self.rows_written = 0
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+
+    @classmethod
+    def check_dependencies(cls) -> None:
+        pass
+
+    @abc.abstractmethod
+    def write_rows(self, rows: Sequence[list[str | int | float]]) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.finish()
+        os.replace(self.tmp_path, self.file_path)
+        get_run_metrics().increment("export_rows_written_total", self.rows_written, format=self.file_extension)
+        logger.info(f"Записано строк: {self.rows_written} в файл '{self.file_path}'.")
+
+    def abort(self) -> None:
+        with contextlib.suppress(Exception):
+            self.finish()
+        with contextlib.suppress(OSError):
+            os.remove(self.tmp_path)
+
+class CsvReportSink(ReportFileSink):
+    file_extension = "csv"
+
+    def __init__(self, file_path: str, headers_list: list[str]) -> None:
+        super().__init__(file_path, headers_list)
+        self._file = open(self.tmp_path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.field_names)
+
+    def write_rows(self, rows: Sequence[list[str | int | float]]) -> None:
+        self._writer.writerows(rows)
+        self.rows_written += len(rows)
+
+    def finish(self) -> None:
+        self._file.close()
+
+class JsonlReportSink(ReportFileSink):
+    file_extension = "jsonl"
+
+    def __init__(self, file_path: str, headers_list: list[str]) -> None:
+        super().__init__(file_path, headers_list)
+        self._file = open(self.tmp_path, "w", encoding="utf-8")
+
+    def write_rows(self, rows: Sequence[list[str | int | float]]) -> None:
+        self._file.writelines(
+            json.dumps(dict(zip(self.field_names, row)), ensure_ascii=False) + "\n" for row in rows
+        )
+        self.rows_written += len(rows)
+
+    def finish(self) -> None:
+        self._file.close()
+
+class ParquetReportSink(ReportFileSink):
+    file_extension = "parquet"
+
+    @classmethod
+    def check_dependencies(cls) -> None:
+        import pyarrow.parquet
+
+    def __init__(self, file_path: str, headers_list: list[str]) -> None:
+        import pyarrow
+        import pyarrow.parquet
+        super().__init__(file_path, headers_list)
+        self._pyarrow = pyarrow
+        self._numeric_columns = {
+            col_index for col_index, name in enumerate(self.field_names) if name.startswith(SHEET_NUMERIC_HEADER_PREFIXES)
+        }
+        self._schema = pyarrow.schema([
+            (name, pyarrow.int64() if col_index in self._numeric_columns else pyarrow.string())
+            for col_index, name in enumerate(self.field_names)
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(self.tmp_path, self._schema)
+        self._pending_rows: list[list[str | int | float]] = []
+
+    def write_rows(self, rows: Sequence[list[str | int | float]]) -> None:
+        self._pending_rows.extend(rows)
+        self.rows_written += len(rows)
+        if len(self._pending_rows) >= PARQUET_ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending_rows:
+            return
+        columns = [
+            [
+                (None if row[col_index] == "" else int(row[col_index])) if col_index in self._numeric_columns
+                else (None if row[col_index] is None else str(row[col_index]))
+                for row in self._pending_rows
+            ]
+            for col_index in range(len(self.field_names))
+        ]
+        self._writer.write_table(self._pyarrow.Table.from_arrays(
+            [self._pyarrow.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema
+        ))
+        self._pending_rows = []
+
+    def finish(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._writer.close()
+
+REPORT_FILE_SINKS: dict[str, type[ReportFileSink]] = {
+    sink_class.file_extension: sink_class for sink_class in (CsvReportSink, JsonlReportSink, ParquetReportSink)
+}
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    arg_parser = argparse.ArgumentParser(description="Генерация отчета WEEEK в Google Таблицу.")
+    arg_parser.add_argument(
+        "--refresh", action="store_true",
+        help="Игнорировать кэш участников и колонок досок и загрузить их заново."
+    )
+    arg_parser.add_argument(
+        "--incremental", action="store_true",
+        help="Синхронизировать задачи с локальным SQLite-снимком и загружать только измененные."
+    )
+    arg_parser.add_argument(
+        "--full-resync", action="store_true",
+        help="Вместе с --incremental: принудительно выполнить полную синхронизацию снимка."
+    )
+    arg_parser.add_argument(
+        "--diff-write", action="store_true",
+        help="Записывать в лист только измененные, добавленные и удаленные строки вместо полной перезаписи."
+    )
+    arg_parser.add_argument("--metrics-json", help="Сохранить сводку метрик выполнения в JSON-файл.")
+    arg_parser.add_argument("--metrics-prom", help="Сохранить метрики в текстовом формате Prometheus (textfile collector).")
+    arg_parser.add_argument("--profile", help="Записать профиль cProfile в указанный файл.")
+    arg_parser.add_argument(
+        "--tracemalloc", action="store_true",
+        help="Отслеживать пиковое потребление памяти через tracemalloc и вывести крупнейшие аллокации."
+    )
+    arg_parser.add_argument(
+        "--targets-config",
+        help="JSON-файл со списком целей (рабочая область WEEEK -> Google Таблица) для параллельного формирования."
+    )
+    arg_parser.add_argument(
+        "--max-parallel-targets", type=int,
+        help=f"Количество целей, обрабатываемых одновременно (по умолчанию {DEFAULT_MAX_PARALLEL_TARGETS})."
+    )
+    arg_parser.add_argument(
+        "--daemon", action="store_true",
+        help="Работать как сервис: держать клиенты и кэши в памяти, обновлять по расписанию и по webhook."
+    )
+    arg_parser.add_argument(
+        "--interval", type=int, default=DAEMON_DEFAULT_INTERVAL_SECONDS,
+        help=f"Вместе с --daemon: интервал планового обновления в секундах (по умолчанию {DAEMON_DEFAULT_INTERVAL_SECONDS})."
+    )
+    arg_parser.add_argument(
+        "--listen", default=DAEMON_DEFAULT_LISTEN,
+        help=f"Вместе с --daemon: адрес HTTP-триггера host:port (по умолчанию {DAEMON_DEFAULT_LISTEN})."
+    )
+    arg_parser.add_argument(
+        "--backfill-from", type=date.fromisoformat, metavar="YYYY-MM-DD",
+        help="Сформировать отчеты за все полумесячные периоды начиная с этой даты, по листу на период."
+    )
+    arg_parser.add_argument(
+        "--backfill-to", type=date.fromisoformat, metavar="YYYY-MM-DD",
+        help="Вместе с --backfill-from: последняя дата диапазона (по умолчанию сегодня)."
+    )
+    arg_parser.add_argument(
+        "--output", choices=[OUTPUT_SHEETS, *REPORT_FILE_SINKS], default=OUTPUT_SHEETS,
+        help="Куда выгружать отчет: в Google Таблицу (по умолчанию) или в файл CSV/JSONL/Parquet (нужен pyarrow)."
+    )
+    arg_parser.add_argument(
+        "--output-path", metavar="TEMPLATE",
+        help=f"Вместе с файловым --output: шаблон пути с полями {{target}}, {{sheet}}, {{format}} (по умолчанию '{EXPORT_PATH_TEMPLATE}')."
+    )
+    args = arg_parser.parse_args(argv)
+    if args.backfill_to and not args.backfill_from:
+        arg_parser.error("--backfill-to используется только вместе с --backfill-from.")
+    if args.interval < 1:
+        arg_parser.error("--interval должен быть не меньше 1 секунды.")
+    if args.backfill_from and args.daemon:
+        arg_parser.error("--backfill-from нельзя использовать вместе с --daemon.")
+    if args.backfill_from and args.backfill_from > (args.backfill_to or date.today()):
+        arg_parser.error("--backfill-from не может быть позже --backfill-to (или сегодняшней даты).")
+    return args
+
+class ReportTarget(NamedTuple):
+    name: str
+    weeek_token: str
+    sheet_id: str
+    sheet_name: str = SHEET_NAME
+
+class TargetResult(NamedTuple):
+    target: ReportTarget
+    succeeded: bool
+    metrics: RunMetrics
+
+def iter_report_row_batches(
+    args: argparse.Namespace,
+    weeek_api_token: str,
+    periods: Sequence[tuple[date, date]],
+    metadata_cache: MetadataCache,
+    task_store: TaskStore | None = None,
+    sync_tasks: bool = True
+) -> Iterator[list[list[str | int | float]]]:
+    try:
+        if args.incremental or task_store is not None:
+            store = task_store or open_task_store(weeek_api_token)
+            try:
+                with store.snapshot_lock:
+                    members, tasks, board_cols_map = fetch_weeek_data_from_store(
+                        weeek_api_token, store, metadata_cache, full_resync=args.full_resync, sync_tasks=sync_tasks
+                    )
+                    if tasks is not None:
+                        for task_batch in iter_batches(tasks, TASK_BATCH_SIZE):
+                            yield process_tasks_to_sheet_rows(task_batch, members, board_cols_map, *periods)
+            finally:
+                if task_store is None:
+                    store.close()
+        else:
+            members = fetch_workspace_members(weeek_api_token, metadata_cache)
+            yield from stream_task_rows(weeek_api_token, members, periods, metadata_cache)
+    finally:
+        metadata_cache.save()
+
+def collect_report_rows(
+    args: argparse.Namespace,
+    weeek_api_token: str,
+    periods: Sequence[tuple[date, date]],
+    metadata_cache: MetadataCache,
+    **report_options
+) -> list[list[str | int | float]] | None:
+    sheet_rows_data: list[list[str | int | float]] = []
+    try:
+        for batch_rows in iter_report_row_batches(args, weeek_api_token, periods, metadata_cache, **report_options):
+            sheet_rows_data.extend(batch_rows)
+    except TaskPaginationError as e:
+        logger.error(f"{e} Неполный список задач отброшен.")
+        return None
+    return sheet_rows_data
+
+def get_export_path(args: argparse.Namespace, target: ReportTarget, sheet_name: str) -> str:
+    return (args.output_path or EXPORT_PATH_TEMPLATE).format(target=target.name, sheet=sheet_name, format=args.output)
+
+def export_report_rows(
+    args: argparse.Namespace,
+    target: ReportTarget,
+    periods: Sequence[tuple[date, date]],
+    row_batches: Iterable[list[list[str | int | float]]]
+) -> bool:
+    sink_class = REPORT_FILE_SINKS[args.output]
+    backfill = bool(args.backfill_from)
+    sinks: dict[int, ReportFileSink] = {}
+
+    def get_sink(period_num: int) -> ReportFileSink:
+        if period_num not in sinks:
+            if backfill:
+                period_start, period_end = periods[period_num]
+                sheet_name = BACKFILL_SHEET_NAME_TEMPLATE.format(sheet_name=target.sheet_name, start=period_start, end=period_end)
+                headers_list = build_report_headers(periods[period_num])
+            else:
+                sheet_name, headers_list = target.sheet_name, build_report_headers(*periods)
+            sinks[period_num] = sink_class(get_export_path(args, target, sheet_name), headers_list)
+        return sinks[period_num]
+
+    try:
+        with get_run_metrics().phase("export_report_rows"):
+            for batch_rows in row_batches:
+                if not backfill:
+                    get_sink(0).write_rows(batch_rows)
+                    continue
+                for period_num, period_rows in enumerate(split_rows_by_period(batch_rows, len(periods))):
+                    if period_rows:
+                        get_sink(period_num).write_rows(period_rows)
+    except TaskPaginationError as e:
+        for sink in sinks.values():
+            sink.abort()
+        logger.error(f"[{target.name}] {e} Неполная выгрузка отброшена.")
+        return False
+    except Exception:
+        for sink in sinks.values():
+            sink.abort()
+        raise
+
+    if not sinks:
+        logger.warning(f"[{target.name}] Данные по задачам не загружены. Выгрузка не создана.")
+        return False
+    for sink in sinks.values():
+        sink.close()
+    return True
+
+def generate_backfill_reports(
+    args: argparse.Namespace,
+    target: ReportTarget,
+    gs_client: "gspread.Client",
+    metadata_cache: MetadataCache,
+    periods: Sequence[tuple[date, date]],
+    **report_options
+) -> bool:
+    sheet_rows_data = collect_report_rows(args, target.weeek_token, periods, metadata_cache, **report_options)
+    if not sheet_rows_data:
+        logger.warning(f"[{target.name}] Данные по задачам не загружены. Формирование отчетов невозможно.")
+        return False
+
+    succeeded = True
+    for period, period_rows in zip(periods, split_rows_by_period(sheet_rows_data, len(periods))):
+        period_start, period_end = period
+        sheet_name = BACKFILL_SHEET_NAME_TEMPLATE.format(sheet_name=target.sheet_name, start=period_start, end=period_end)
+        if not period_rows:
+            logger.info(f"[{target.name}] За период {period_start:%d.%m.%Y} - {period_end:%d.%m.%Y} нет затреканного времени.")
+            continue
+        succeeded &= update_google_sheet(
+            gs_client, target.sheet_id, sheet_name, build_report_headers(period), period_rows,
+            diff_write=args.diff_write
+        )
+    return succeeded
+
+def generate_report(
+    args: argparse.Namespace,
+    target: ReportTarget,
+    gs_client: "gspread.Client | None",
+    metadata_cache: MetadataCache,
+    task_store: TaskStore | None = None,
+    sync_tasks: bool = True
+) -> bool:
+    if args.backfill_from:
+        periods = get_half_month_periods(args.backfill_from, args.backfill_to or date.today())
+        logger.info(f"[{target.name}] Формирование отчетов за прошлые периоды: {len(periods)}.")
+    else:
+        periods = get_reporting_periods(date.today())
+    if args.output != OUTPUT_SHEETS:
+        row_batches = iter_report_row_batches(
+            args, target.weeek_token, periods, metadata_cache, task_store=task_store, sync_tasks=sync_tasks
+        )
+        return export_report_rows(args, target, periods, row_batches)
+    if args.backfill_from:
+        return generate_backfill_reports(
+            args, target, gs_client, metadata_cache, periods, task_store=task_store, sync_tasks=sync_tasks
+        )
+    sheet_rows_data = collect_report_rows(
+        args, target.weeek_token, periods, metadata_cache, task_store=task_store, sync_tasks=sync_tasks
+    )
+    if not sheet_rows_data:
+        logger.warning(f"[{target.name}] Данные по задачам не загружены. Формирование отчета невозможно.")
+        return False
+
+    report_headers = build_report_headers(*periods)
+    return update_google_sheet(
+        gs_client, target.sheet_id, target.sheet_name, report_headers, sheet_rows_data, diff_write=args.diff_write
+    )
+
+def resolve_config_value(config: dict, key: str) -> str | None:
+    if config.get(key):
+        return str(config[key])
+    env_name = config.get(f"{key}_env")
+    return os.getenv(env_name) if env_name else None
+
+def load_report_targets(config_path: str, require_sheet_id: bool = True) -> tuple[list[ReportTarget], dict]:
+    with open(config_path, encoding="utf-8") as config_file:
+        config = json.load(config_file)
+    if not isinstance(config, dict):
+        raise ValueError("ожидается JSON-объект с ключом 'targets'")
+    try:
+        config["max_parallel"] = int(config.get("max_parallel", DEFAULT_MAX_PARALLEL_TARGETS))
+    except (TypeError, ValueError):
+        raise ValueError(f"некорректное значение max_parallel: {config.get('max_parallel')!r}") from None
+    if config["max_parallel"] < 1:
+        raise ValueError(f"max_parallel должно быть не меньше 1, получено {config['max_parallel']}")
+    targets: list[ReportTarget] = []
+    for target_num, target_config in enumerate(config.get("targets", []), start=1):
+        target_name = str(target_config.get("name") or f"target-{target_num}")
+        weeek_token = resolve_config_value(target_config, "weeek_token")
+        sheet_id = resolve_config_value(target_config, "sheet_id") or ""
+        if not (weeek_token and (sheet_id or not require_sheet_id)):
+            logger.error(f"Цель '{target_name}': не заданы weeek_token/weeek_token_env или sheet_id/sheet_id_env. Пропуск.")
+            continue
+        targets.append(ReportTarget(
+            name=target_name, weeek_token=weeek_token, sheet_id=sheet_id,
+            sheet_name=target_config.get("sheet_name") or SHEET_NAME
+        ))
+    return targets, config
+
+def run_report_target(
+    args: argparse.Namespace, target: ReportTarget, gs_client: "gspread.Client | None", metadata_cache: MetadataCache,
+    metrics: RunMetrics | None = None, **report_options
+) -> TargetResult:
+    metrics = metrics or RunMetrics(run_name=target.name)
+    _run_metrics.set(metrics)
+    succeeded = False
+    logger.info(f"[{target.name}] Формирование отчета...")
+    try:
+        with metrics.phase("total"):
+            succeeded = generate_report(args, target, gs_client, metadata_cache, **report_options)
+    except Exception as e:
+        logger.error(f"[{target.name}] Ошибка при формировании отчета: {e}", exc_info=True)
+    metrics.set_gauge("success", int(succeeded))
+    metrics.set_gauge("last_run_timestamp_seconds", time.time())
+    logger.info(
+        f"[{target.name}] {'Отчет сформирован' if succeeded else 'Отчет не сформирован'} "
+        f"за {metrics.phase_seconds['total']:.1f} с."
+    )
+    return TargetResult(target, succeeded, metrics)
+
+def sync_workspace_task_store(
+    token: str, store: TaskStore, full_resync: bool = False, task_ids: Iterable[str] = (), sync_tasks: bool = True
+) -> None:
+    with store.snapshot_lock:
+        if task_ids:
+            refresh_store_tasks(token, store, sorted(task_ids))
+        if sync_tasks:
+            sync_task_store(token, store, full_resync)
+
+def run_target_jobs(
+    args: argparse.Namespace,
+    jobs: Sequence[tuple[ReportTarget, set[str] | None]],
+    gs_client: "gspread.Client | None",
+    metadata_cache: MetadataCache,
+    max_parallel: int,
+    task_stores: dict[str, TaskStore] | None = None
+) -> list[TargetResult]:
+    job_metrics = [RunMetrics(run_name=target.name) for target, _ in jobs]
+    workspace_jobs: dict[str, list[int]] = {}
+    if task_stores:
+        for job_num, (target, _) in enumerate(jobs):
+            workspace_jobs.setdefault(get_workspace_key(target.weeek_token), []).append(job_num)
+
+    def sync_workspace(workspace_key: str) -> None:
+        job_nums = workspace_jobs[workspace_key]
+        target = jobs[job_nums[0]][0]
+        _run_metrics.set(job_metrics[job_nums[0]])
+        try:
+            sync_workspace_task_store(
+                target.weeek_token, task_stores[workspace_key], full_resync=args.full_resync,
+                task_ids=set().union(*(jobs[job_num][1] or () for job_num in job_nums)),
+                sync_tasks=any(jobs[job_num][1] is None for job_num in job_nums)
+            )
+        except Exception as e:
+            logger.error(f"[{target.name}] Ошибка синхронизации задач, используется предыдущий снимок: {e}", exc_info=True)
+
+    def run_job(job_num: int) -> TargetResult:
+        target = jobs[job_num][0]
+        report_options = {}
+        if task_stores:
+            report_options = {"task_store": task_stores[get_workspace_key(target.weeek_token)], "sync_tasks": False}
+        return run_report_target(
+            args, target, gs_client, metadata_cache, metrics=job_metrics[job_num], **report_options
+        )
+
+    pool_size = max(1, min(max_parallel, len(jobs) or 1))
+    with ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="weeek-target") as executor:
+        sync_futures = [
+            executor.submit(contextvars.copy_context().run, sync_workspace, workspace_key)
+            for workspace_key in workspace_jobs
+        ]
+        for future in sync_futures:
+            future.result()
+        futures = [
+            executor.submit(contextvars.copy_context().run, run_job, job_num) for job_num in range(len(jobs))
+        ]
+        return [future.result() for future in futures]
+
+def run_report_targets(
+    args: argparse.Namespace,
+    targets: Sequence[ReportTarget],
+    gs_client: "gspread.Client | None",
+    metadata_cache: MetadataCache,
+    max_parallel: int
+) -> list[TargetResult]:
+    task_stores = open_workspace_task_stores(targets) if args.incremental else {}
+    try:
+        return run_target_jobs(
+            args, [(target, None) for target in targets], gs_client, metadata_cache, max_parallel, task_stores
+        )
+    finally:
+        for task_store in task_stores.values():
+            task_store.close()
+
+def prepare_targets(args: argparse.Namespace) -> tuple[list[ReportTarget], "gspread.Client | None", int] | None:
     if not load_dotenv(ENV_FILE_PATH):
         logger.info(f"Файл '{ENV_FILE_PATH}' не найден. Используются системные переменные окружения.")
-    
-    weeek_api_token = get_env_variable(API_TOKEN_ENV_NAME)
-    google_sheet_id = get_env_variable(GOOGLE_SHEET_ID_ENV_NAME)
-    google_creds_file = get_env_variable(GOOGLE_CREDENTIALS_FILENAME_ENV_NAME)
-    
-    if not (weeek_api_token and google_sheet_id and google_creds_file):
-        logger.error("Одна или несколько критических переменных окружения отсутствуют. Завершение работы.")
-        return
-
-    gs_client = get_gspread_client(google_creds_file)
-    if not gs_client:
-        logger.error("Не удалось инициализировать клиент Google Sheets. Завершение работы.")
-        return
-    
-    current_day = date.today()
-    (p1_start, p1_end), (p2_start, p2_end) = get_reporting_periods(current_day)
-
-    members, tasks, board_cols_map = fetch_weeek_data(weeek_api_token)
-
-    if not tasks:
-        logger.warning("Данные по задачам не загружены. Формирование отчета невозможно.")
-        return
-    
-    sheet_rows_data = process_tasks_to_sheet_rows(
-        tasks, members, board_cols_map, (p1_start, p1_end), (p2_start, p2_end)
-    )
 
-    report_headers = [
-        "Задача (Номер)", "Приоритет", "Исполнитель", "Статус",
-        "Дата начала", "Дата окончания", "Оценка времени",
-        f"Затрекано ({p1_start:%d.%m} - {p1_end:%d.%m})", 
-        "Комментарии", 
-        f"Затрекано ({p2_start:%d.%m} - {p2_end:%d.%m})", 
-        "Комментарии", 
-        "Стоимость в час", "Расчет зп"
-    ]
-    
-    update_google_sheet(gs_client, google_sheet_id, SHEET_NAME, report_headers, sheet_rows_data)
+    if args.targets_config:
+        try:
+            targets, config = load_report_targets(args.targets_config, require_sheet_id=args.output == OUTPUT_SHEETS)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать конфигурацию целей '{args.targets_config}': {e}")
+            return None
+        if not targets:
+            logger.error("В конфигурации нет ни одной корректной цели. Завершение работы.")
+            return None
+        google_creds_file = config.get("google_credentials_file") or (
+            get_env_variable(GOOGLE_CREDENTIALS_FILENAME_ENV_NAME) if args.output == OUTPUT_SHEETS else None
+        )
+        max_parallel = args.max_parallel_targets or config["max_parallel"]
+    elif args.output != OUTPUT_SHEETS:
+        weeek_api_token = get_env_variable(API_TOKEN_ENV_NAME)
+        targets = [ReportTarget(name="default", weeek_token=weeek_api_token, sheet_id="")]
+        max_parallel = 1
+    else:
+        weeek_api_token = get_env_variable(API_TOKEN_ENV_NAME)
+        google_sheet_id = get_env_variable(GOOGLE_SHEET_ID_ENV_NAME)
+        google_creds_file = get_env_variable(GOOGLE_CREDENTIALS_FILENAME_ENV_NAME)
+        if not (weeek_api_token and google_sheet_id and google_creds_file):
+            logger.error("Одна или несколько критических переменных окружения отсутствуют. Завершение работы.")
+            return None
+        targets = [ReportTarget(name="default", weeek_token=weeek_api_token, sheet_id=google_sheet_id)]
+        max_parallel = 1
+
+    gs_client = None
+    if args.output == OUTPUT_SHEETS:
+        gs_client = get_gspread_client(google_creds_file)
+        if not gs_client:
+            logger.error("Не удалось инициализировать клиент Google Sheets. Завершение работы.")
+            return None
+    else:
+        try:
+            REPORT_FILE_SINKS[args.output].check_dependencies()
+        except ImportError as e:
+            logger.error(f"Для формата '{args.output}' не установлена зависимость: {e.name}. Завершение работы.")
+            return None
+    set_http_pool_size(min(max_parallel, len(targets)) * (get_max_workers() + 1))
+    return targets, gs_client, max_parallel
+
+def run_report(args: argparse.Namespace) -> bool:
+    logger.info("Запуск скрипта генерации отчета WEEEK.")
+    prepared = prepare_targets(args)
+    if prepared is None:
+        return False
+    (target,), gs_client, _ = prepared
+    if not generate_report(args, target, gs_client, create_metadata_cache(refresh=args.refresh)):
+        return False
     logger.info("Скрипт генерации отчета WEEEK успешно завершил работу.")
+    return True
+
+def run_targets_from_config(args: argparse.Namespace) -> list[TargetResult]:
+    logger.info(f"Запуск формирования отчетов по конфигурации '{args.targets_config}'.")
+    prepared = prepare_targets(args)
+    if prepared is None:
+        return []
+    targets, gs_client, max_parallel = prepared
+    results = run_report_targets(args, targets, gs_client, create_metadata_cache(refresh=args.refresh), max_parallel)
+    succeeded_count = sum(result.succeeded for result in results)
+    logger.info(f"Сформировано отчетов: {succeeded_count} из {len(results)}.")
+    return results
+
+class ReportDaemon:
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        targets: list[ReportTarget],
+        gs_client: "gspread.Client | None",
+        max_parallel: int
+    ) -> None:
+        self.args = args
+        self.targets = {target.name: target for target in targets}
+        self.gs_client = gs_client
+        self.max_parallel = max_parallel
+        self.metadata_cache = create_metadata_cache(refresh=args.refresh)
+        self.task_stores = open_workspace_task_stores(targets)
+        self.last_results: dict[str, TargetResult] = {}
+        self.webhook_secret = os.getenv(WEBHOOK_SECRET_ENV_NAME)
+        self._pending_targets: set[str] = set()
+        self._pending_task_ids: dict[str, set[str]] = {}
+        self._pending_lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+
+    def request_refresh(self, target_name: str | None = None, task_ids: Iterable[str] = ()) -> bool:
+        if target_name is not None and target_name not in self.targets:
+            return False
+        target_names = [target_name] if target_name is not None else list(self.targets)
+        task_ids = {str(task_id) for task_id in task_ids}
+        with self._pending_lock:
+            for name in target_names:
+                if task_ids:
+                    self._pending_task_ids.setdefault(name, set()).update(task_ids)
+                else:
+                    self._pending_targets.add(name)
+        self._wake_event.set()
+        return True
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def take_pending(self) -> tuple[set[str], dict[str, set[str]]]:
+        with self._pending_lock:
+            pending_targets, pending_task_ids = self._pending_targets, self._pending_task_ids
+            self._pending_targets, self._pending_task_ids = set(), {}
+        return pending_targets, {
+            name: task_ids for name, task_ids in pending_task_ids.items() if name not in pending_targets
+        }
+
+    def run_cycle(self, target_names: set[str], task_ids_by_target: dict[str, set[str]]) -> None:
+        jobs = [(self.targets[name], None) for name in sorted(target_names)]
+        jobs += [(self.targets[name], task_ids) for name, task_ids in sorted(task_ids_by_target.items())]
+        if not jobs:
+            return
+        results = run_target_jobs(
+            self.args, jobs, self.gs_client, self.metadata_cache, self.max_parallel, self.task_stores
+        )
+        for result in results:
+            self.last_results[result.target.name] = result
+        self.metadata_cache.refresh = False
+        export_run_metrics(
+            [result.metrics for result in self.last_results.values()], self.args.metrics_json, self.args.metrics_prom
+        )
+
+    def run_forever(self) -> None:
+        host, port = parse_listen_address(self.args.listen)
+        http_server = ThreadingHTTPServer((host, port), self.make_request_handler())
+        threading.Thread(target=http_server.serve_forever, name="weeek-webhook", daemon=True).start()
+        logger.info(
+            f"Сервис запущен: обновление каждые {self.args.interval} с, "
+            f"webhook на http://{host or '0.0.0.0'}:{port}/refresh."
+        )
+        next_scheduled_run = time.monotonic()
+        try:
+            while not self._stop_event.is_set():
+                if time.monotonic() >= next_scheduled_run:
+                    self.request_refresh()
+                    next_scheduled_run = time.monotonic() + self.args.interval
+                self._wake_event.wait(timeout=max(0.0, next_scheduled_run - time.monotonic()))
+                if self._stop_event.is_set():
+                    break
+                if self._wake_event.is_set():
+                    self._stop_event.wait(DAEMON_TRIGGER_DEBOUNCE_SECONDS)
+                    self._wake_event.clear()
+                    pending_targets, pending_task_ids = self.take_pending()
+                    if set(self.targets) <= pending_targets:
+                        next_scheduled_run = time.monotonic() + self.args.interval
+                    self.run_cycle(pending_targets, pending_task_ids)
+        finally:
+            http_server.shutdown()
+            http_server.server_close()
+            self.metadata_cache.save()
+            for task_store in self.task_stores.values():
+                task_store.close()
+            logger.info("Сервис остановлен.")
+
+    def health_summary(self) -> dict:
+        return {
+            "targets": {
+                name: {
+                    "succeeded": result.succeeded,
+                    "last_run_timestamp": result.metrics.started_at,
+                    "duration_seconds": round(result.metrics.phase_seconds["total"], 3),
+                }
+                for name, result in self.last_results.items()
+            }
+        }
+
+    def make_request_handler(self) -> type:
+        daemon = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args) -> None:
+                logger.debug(f"webhook: {format % args}")
+
+            def send_json(self, status_code: int, body: dict) -> None:
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self) -> None:
+                if self.path == "/health":
+                    self.send_json(200, daemon.health_summary())
+                elif self.path == "/metrics":
+                    payload = format_prometheus_metrics(
+                        [result.metrics for result in daemon.last_results.values()]
+                    ).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                else:
+                    self.send_json(404, {"error": "not found"})
+
+            def do_POST(self) -> None:
+                if self.path.split("?", 1)[0] != "/refresh":
+                    self.send_json(404, {"error": "not found"})
+                    return
+                if daemon.webhook_secret and not hmac.compare_digest(
+                    self.headers.get("X-Webhook-Token", "").encode("utf-8"), daemon.webhook_secret.encode("utf-8")
+                ):
+                    self.send_json(403, {"error": "forbidden"})
+                    return
+                content_length_header = self.headers.get("Content-Length") or "0"
+                if not content_length_header.isdigit():
+                    self.send_json(400, {"error": "invalid content length"})
+                    return
+                content_length = int(content_length_header)
+                if content_length > WEBHOOK_MAX_BODY_BYTES:
+                    self.send_json(413, {"error": "payload too large"})
+                    return
+                try:
+                    body = json.loads(self.rfile.read(content_length) or b"{}")
+                except ValueError:
+                    self.send_json(400, {"error": "invalid json"})
+                    return
+                if not isinstance(body, dict):
+                    self.send_json(400, {"error": "invalid json"})
+                    return
+                if body.get("target") is not None and not isinstance(body["target"], str):
+                    self.send_json(400, {"error": "target must be a string"})
+                    return
+                task_ids = body.get("taskIds") or body.get("task_ids") or []
+                if not isinstance(task_ids, list):
+                    self.send_json(400, {"error": "taskIds must be a list"})
+                    return
+                if isinstance(body.get("task"), dict) and body["task"].get("id") is not None:
+                    task_ids = [*task_ids, body["task"]["id"]]
+                task_ids = [str(task_id) for task_id in task_ids]
+                if len(task_ids) > WEBHOOK_MAX_TASK_IDS:
+                    self.send_json(413, {"error": f"too many task ids (max {WEBHOOK_MAX_TASK_IDS})"})
+                    return
+                invalid_task_ids = [task_id for task_id in task_ids if not TASK_ID_PATTERN.match(task_id)]
+                if invalid_task_ids:
+                    self.send_json(400, {"error": "invalid task ids", "taskIds": invalid_task_ids[:10]})
+                    return
+                if not daemon.request_refresh(body.get("target"), task_ids):
+                    self.send_json(404, {"error": f"unknown target '{body.get('target')}'"})
+                    return
+                self.send_json(202, {"accepted": True, "taskIds": task_ids})
+
+        return WebhookHandler
+
+def parse_listen_address(listen: str | None) -> tuple[str, int]:
+    host, _, port = (listen or DAEMON_DEFAULT_LISTEN).rpartition(":")
+    return host.strip("[]"), int(port)
+
+def is_loopback_host(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def run_daemon(args: argparse.Namespace) -> bool:
+    logger.info("Запуск генератора отчетов WEEEK в режиме сервиса.")
+    try:
+        host, _ = parse_listen_address(args.listen)
+    except ValueError:
+        logger.error(f"Некорректный адрес --listen '{args.listen}', ожидается host:port.")
+        return False
+    prepared = prepare_targets(args)
+    if prepared is None:
+        return False
+    if not is_loopback_host(host) and not os.getenv(WEBHOOK_SECRET_ENV_NAME):
+        logger.error(
+            f"Адрес '{args.listen}' доступен не только локально: задайте {WEBHOOK_SECRET_ENV_NAME} "
+            "или используйте loopback-адрес. Завершение работы."
+        )
+        return False
+    targets, gs_client, max_parallel = prepared
+    daemon = ReportDaemon(args, targets, gs_client, max_parallel)
+    previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        logger.info("Получен сигнал остановки.")
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+    return True
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    metrics = RunMetrics()
+    _run_metrics.set(metrics)
+    metrics_list = [metrics]
+    profiler = cProfile.Profile() if args.profile else None
+    if args.tracemalloc:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    succeeded = False
+    try:
+        with metrics.phase("total"):
+            if args.daemon:
+                succeeded = run_daemon(args)
+            elif args.targets_config:
+                target_results = run_targets_from_config(args)
+                metrics_list += [result.metrics for result in target_results]
+                succeeded = bool(target_results) and all(result.succeeded for result in target_results)
+            else:
+                succeeded = run_report(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            logger.info(f"Профиль cProfile сохранен в '{args.profile}'.")
+        if args.tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            metrics.set_gauge("peak_traced_memory_bytes", tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            for stat in snapshot.statistics("lineno")[:10]:
+                logger.info(f"tracemalloc: {stat}")
+        metrics.set_gauge("success", int(succeeded))
+        metrics.set_gauge("last_run_timestamp_seconds", time.time())
+        export_run_metrics(metrics_list, args.metrics_json, args.metrics_prom)
 
 if __name__ == "__main__":
     try: